@@ -0,0 +1,221 @@
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Chunked, vectorized BMI scoring for the bulk mode of pages/bmi.py
+# (no Streamlit imports). Files are read CHUNK_ROWS rows at a time and results
+# are written to disk as they go, so memory does not grow with the file.
+#
+#   python bmi_bulk.py --check    # write results across chunk boundaries
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet in/out needs pyarrow; CSV works without it
+    pa = pacsv = pq = None
+
+bmi_categories = {
+    18.5: "Underweight",
+    24.9: "Healthy weight",
+    29.9: "Overweight",
+    float('inf'): "Obese"
+}
+
+# A BMI equal to a threshold belongs to the lower category, same as the
+# `bmi <= threshold` walk on the single-person page, hence side="left"
+THRESHOLDS = np.array(list(bmi_categories)[:-1])
+CATEGORIES = list(bmi_categories.values())
+INVALID = "Invalid"  # Missing, zero or negative weight/height
+LABELS = np.array(CATEGORIES + [INVALID], dtype=object)
+BMI_BINS = np.arange(10.0, 61.0)  # 1-unit histogram bins; outliers go in the end bins
+CHUNK_ROWS = 500_000
+RESULT_DIR = os.path.join(".cache", "bmi")
+
+
+def is_parquet(name):
+    return name.lower().endswith((".parquet", ".pq"))
+
+def read_columns(file, name):
+    # Column names only, without reading the data
+    if is_parquet(name):
+        columns = pq.ParquetFile(file).schema_arrow.names
+    else:
+        columns = list(pd.read_csv(file, nrows=0).columns)
+    file.seek(0)
+    return columns
+
+def iter_chunks(file, name, chunk_rows=CHUNK_ROWS, text_columns=()):
+    # CSV `text_columns` are read as strings: pandas guesses dtypes per chunk,
+    # which would otherwise change between chunks of the same column
+    if is_parquet(name):
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas(ignore_metadata=True)
+    else:
+        yield from pd.read_csv(file, chunksize=chunk_rows, dtype={c: str for c in text_columns})
+
+def result_types(file, name, columns, weight_column, height_column):
+    # One Arrow type per output column, fixed for the whole file: the source
+    # column's type for Parquet, strings for CSV, float64 weight/height/bmi
+    if is_parquet(name):
+        types = {field.name: field.type for field in pq.ParquetFile(file).schema_arrow}
+        file.seek(0)
+    else:
+        types = {column: pa.string() for column in columns}
+    types[weight_column] = types[height_column] = types["bmi"] = pa.float64()
+    types["category"] = pa.dictionary(pa.int8(), pa.string())
+    return types
+
+def bmi_values(weight_kg, height_cm):
+    # float64 arrays in, BMI out; invalid rows give NaN
+    height_m = height_cm * 0.01
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = weight_kg / (height_m * height_m)
+    bmi[~((weight_kg > 0) & (height_cm > 0))] = np.nan
+    return bmi
+
+def categorize(bmi):
+    # Index into LABELS: 0..3 for the categories, 4 for invalid (NaN) rows
+    index = np.searchsorted(THRESHOLDS, bmi, side="left")
+    index[np.isnan(bmi)] = len(CATEGORIES)
+    return index
+
+
+class BulkResult:
+    def __init__(self):
+        self.rows = 0
+        self.counts = np.zeros(len(LABELS), dtype=np.int64)
+        self.histogram = np.zeros(len(BMI_BINS) - 1, dtype=np.int64)
+        self.bmi_sum = 0.0
+        self.path = None
+        self.seconds = 0.0
+
+    def add(self, bmi, index):
+        self.rows += len(bmi)
+        self.counts += np.bincount(index, minlength=len(LABELS))
+        valid = bmi[~np.isnan(bmi)]
+        self.bmi_sum += float(valid.sum())
+        self.histogram += np.histogram(np.clip(valid, BMI_BINS[0], BMI_BINS[-1]), BMI_BINS)[0]
+
+    def category_frame(self):
+        return pd.DataFrame({"category": LABELS, "rows": self.counts})
+
+    def histogram_frame(self):
+        return pd.DataFrame({"bmi": BMI_BINS[:-1], "rows": self.histogram})
+
+    def mean_bmi(self):
+        valid = self.rows - self.counts[-1]
+        return self.bmi_sum / valid if valid else float("nan")
+
+
+class ResultWriter:
+    # Appends scored chunks to a CSV or Parquet file under RESULT_DIR; with
+    # pyarrow every chunk is converted to the same schema, built from `types`
+    def __init__(self, fmt, types=None):
+        self.fmt = fmt
+        self.types = types
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix=f".{fmt}", dir=RESULT_DIR)
+        os.close(fd)
+        self.writer = None
+        self.schema = None
+        self.header = True
+
+    def write(self, df):
+        if pa is not None:
+            # pyarrow's CSV writer is several times faster than DataFrame.to_csv
+            if self.writer is None:
+                open_writer = pq.ParquetWriter if self.fmt == "parquet" else pacsv.CSVWriter
+                self.schema = pa.schema([(column, self.types[column]) for column in df.columns])
+                self.writer = open_writer(self.path, self.schema)
+            self.writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        else:
+            df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+            self.header = False
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_file(file, name, weight_column, height_column, result_format=None, chunk_rows=CHUNK_ROWS, progress=None):
+    # Scores every row; result_format "csv"/"parquet" also writes the input
+    # columns plus bmi and category to BulkResult.path. progress(rows) is
+    # called after each chunk.
+    start = time.perf_counter()
+    result = BulkResult()
+    columns = read_columns(file, name)
+    text_columns = [c for c in columns if c not in (weight_column, height_column)]
+    writer = None
+    if result_format:
+        types = result_types(file, name, columns, weight_column, height_column) if pa is not None else None
+        writer = ResultWriter(result_format, types)
+    try:
+        for chunk in iter_chunks(file, name, chunk_rows, text_columns):
+            weight = pd.to_numeric(chunk[weight_column], errors="coerce").to_numpy(np.float64)
+            height = pd.to_numeric(chunk[height_column], errors="coerce").to_numpy(np.float64)
+            bmi = bmi_values(weight, height)
+            index = categorize(bmi)
+            result.add(bmi, index)
+            if writer is not None:
+                chunk[weight_column] = weight
+                chunk[height_column] = height
+                chunk["bmi"] = bmi.round(2)
+                chunk["category"] = pd.Categorical.from_codes(index, LABELS)
+                writer.write(chunk)
+            if progress is not None:
+                progress(result.rows)
+    finally:
+        if writer is not None:
+            writer.close()
+            result.path = writer.path
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+# Types that change between chunks: 70 then 70.5, an empty column then text,
+# and a weight that does not parse
+CHECK_CSV = """id,weight,height,note
+1,70,175,
+2,80,180,
+3,60,165,
+4,70.5,175,hello
+5,abc,170,
+6,72,181.5,w
+"""
+
+def check(chunk_rows=3):
+    # Score CHECK_CSV in small chunks to every result format and read it back
+    failures = []
+    formats = ["csv", "parquet"] if pa is not None else ["csv"]
+    for fmt in formats:
+        try:
+            result = score_file(io.BytesIO(CHECK_CSV.encode()), "check.csv", "weight", "height", fmt, chunk_rows)
+        except Exception as e:
+            failures.append(f"{fmt}: {e}")
+            continue
+        out = pd.read_parquet(result.path) if fmt == "parquet" else pd.read_csv(result.path)
+        os.remove(result.path)
+        if len(out) != 6 or out["weight"].iloc[3] != 70.5 or out["note"].iloc[3] != "hello":
+            failures.append(f"{fmt}: unexpected rows")
+        if result.counts.tolist() != [0, 5, 0, 0, 1]:
+            failures.append(f"{fmt}: counts {result.counts.tolist()}")
+    return formats, failures
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Chunked BMI scoring")
+    parser.add_argument("--check", action="store_true", help="write results across chunk boundaries")
+    args = parser.parse_args()
+
+    if args.check:
+        formats, failures = check()
+        for line in failures:
+            print(line)
+        print(f"{len(formats)} formats checked, {len(failures)} failures")
+        raise SystemExit(1 if failures else 0)
+    parser.print_help()
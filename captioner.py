@@ -0,0 +1,355 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import gc
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import torch
+from PIL import Image
+from transformers import BlipForConditionalGeneration, BlipProcessor, TextIteratorStreamer
+from perf import percentile, span
+
+# BLIP captioning helpers used by pages/ai-caption.py.
+
+MODEL_NAME = "Salesforce/blip-image-captioning-base"
+BACKENDS = ("fp32", "bf16", "int8")
+INPUT_SIZE = 384  # BLIP processor resizes every image to 384x384
+
+
+# --- Image Loading ---
+def load_image(fp, size=INPUT_SIZE):
+    # Decode straight to model resolution: JPEGs use draft mode (DCT scaling
+    # to the smallest 1/2, 1/4 or 1/8 size that still covers `size`), then
+    # one resize to what the processor would produce anyway
+    if hasattr(fp, "seek"):
+        fp.seek(0)
+    image = Image.open(fp)
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    image = image.convert("RGB")
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.Resampling.BICUBIC, reducing_gap=3.0)
+    return image
+
+
+# --- Model Loading ---
+def set_threads(threads):
+    # Intra-op threads for torch ops run on the calling thread; a thread's
+    # OpenMP team size is fixed by its first op, so call this before that
+    if threads:
+        torch.set_num_threads(threads)
+
+def load_captioner(backend="fp32", compile_model=False):
+    # fp32: stock eager model. bf16: weights and activations in bfloat16.
+    # int8: dynamic quantization of the nn.Linear layers. compile_model wraps
+    # the vision encoder and the text decoder's forward in torch.compile.
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    processor = BlipProcessor.from_pretrained(MODEL_NAME)
+    model = BlipForConditionalGeneration.from_pretrained(MODEL_NAME)
+    model.eval()
+    if backend == "bf16":
+        model = model.to(torch.bfloat16)
+    elif backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if compile_model:
+        model.vision_model = torch.compile(model.vision_model)
+        # generate() calls text_decoder.generate(), which a compiled wrapper
+        # would forward to the eager module; each decoding step goes
+        # through forward(), so that is what gets compiled
+        model.text_decoder.forward = torch.compile(model.text_decoder.forward, dynamic=True)
+    return processor, model
+
+def model_tag(backend="fp32", compile_model=False):
+    # Identifies the model variant in cache keys; captions differ per backend
+    return f"{MODEL_NAME}:{backend}{'+compile' if compile_model else ''}"
+
+
+def batched(items, size):
+    # Consecutive micro-batches of at most `size` items
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def generate_streaming(processor, model, image, streamer, max_new_tokens=50):
+    inputs = processor(images=image, return_tensors="pt")
+    inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
+    with torch.inference_mode(), span("generate"):
+        out = model.generate(**inputs, max_new_tokens=max_new_tokens, streamer=streamer)
+    return processor.decode(out[0], skip_special_tokens=True)
+
+def caption_stream(processor, model, image, max_new_tokens=50, worker=None):
+    # Yields caption text piece by piece while generate is still running,
+    # either on the shared worker or on a throwaway thread
+    streamer = TextIteratorStreamer(processor.tokenizer, skip_special_tokens=True, timeout=120)
+    if worker is not None:
+        future = worker.submit(image, streamer)
+    else:
+        future = Future()
+        threading.Thread(
+            target=lambda: future.set_result(generate_streaming(processor, model, image, streamer, max_new_tokens)),
+            daemon=True,
+        ).start()
+    yield from streamer
+    future.result()
+
+def caption_images(processor, model, images, max_new_tokens=50):
+    # One padded forward/generate for the whole list of PIL images
+    inputs = processor(images=images, return_tensors="pt")
+    inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
+    with torch.inference_mode(), span("generate"):
+        out = model.generate(**inputs, max_new_tokens=max_new_tokens)
+    return processor.batch_decode(out, skip_special_tokens=True)
+
+
+# --- Caption Cache ---
+def image_key(image, model_name=MODEL_NAME, **params):
+    # Content address: decoded pixels + model + generation parameters
+    h = hashlib.sha256()
+    h.update(f"{model_name}|{sorted(params.items())}|{image.mode}|{image.size}".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+class CaptionCache:
+    # In-memory LRU in front of an optional sqlite file that survives
+    # restarts. Both tiers are capped by entry count; safe across threads.
+    def __init__(self, max_items=1024, path=None, max_disk_items=100_000):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS captions (key TEXT PRIMARY KEY, caption TEXT NOT NULL, used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS captions_used ON captions (used)")
+            self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            caption = self.memory.get(key)
+            if caption is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return caption
+            if self.db is not None:
+                row = self.db.execute("SELECT caption FROM captions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE captions SET used = ? WHERE key = ?", (time.time(), key))
+                    self.db.commit()
+                    self._remember(key, row[0])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, caption):
+        with self.lock:
+            self._remember(key, caption)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO captions VALUES (?, ?, ?)", (key, caption, time.time()))
+                self.db.execute(
+                    "DELETE FROM captions WHERE key IN "
+                    "(SELECT key FROM captions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_items,),
+                )
+                self.db.commit()
+
+    def _remember(self, key, caption):
+        self.memory[key] = caption
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+def caption_images_cached(processor, model, images, cache, max_new_tokens=50, tag=MODEL_NAME, worker=None, max_batch=None):
+    # Only images missing from the cache go through generate, in one batch
+    # (or through the shared worker, which batches across sessions, at most
+    # `max_batch` images per generate)
+    keys = [image_key(image, tag, max_new_tokens=max_new_tokens) for image in images]
+    captions = [cache.get(key) for key in keys]
+    todo = [i for i, caption in enumerate(captions) if caption is None]
+    if todo:
+        missing = [images[i] for i in todo]
+        if worker is not None:
+            fresh = worker.caption_many(missing, max_batch=max_batch)
+        else:
+            fresh = caption_images(processor, model, missing, max_new_tokens)
+        for i, caption in zip(todo, fresh):
+            captions[i] = caption
+            cache.put(keys[i], caption)
+    return captions
+
+
+# --- Shared Inference Worker ---
+class Overloaded(RuntimeError):
+    pass
+
+class InferenceWorker:
+    # The only thread that calls generate on its model. Requests wait in a
+    # bounded queue and are coalesced into batches of up to `max_batch` (or
+    # the batch's first request's own max_batch), waiting at most `max_wait`
+    # seconds for a batch to fill. submit() raises Overloaded instead of
+    # queueing past `max_queue`; requests whose future was cancelled are
+    # skipped. `threads` is the worker thread's intra-op
+    # thread count, set before its first op.
+    def __init__(self, processor, model, max_batch=8, max_wait=0.02, max_queue=64, max_new_tokens=50, threads=None):
+        self.processor = processor
+        self.model = model
+        self.threads = threads
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self.requests = queue.Queue(maxsize=max_queue)
+        self.held = None  # Streaming request that arrived while a batch was filling
+        self.latencies = deque(maxlen=512)
+        self.batch_sizes = deque(maxlen=512)
+        self.counts = {"submitted": 0, "rejected": 0, "cancelled": 0, "completed": 0, "failed": 0, "batches": 0}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="caption-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, image, streamer=None, max_batch=None):
+        return self.submit_all([image], streamer, max_batch)[0]
+
+    def submit_all(self, images, streamer=None, max_batch=None):
+        # All or nothing: the queue only shrinks outside the lock, so when
+        # the whole list fits it is queued, otherwise none of it is
+        now = time.perf_counter()
+        futures = [Future() for _ in images]
+        with self.lock:
+            if self.requests.maxsize - self.requests.qsize() < len(images):
+                self.counts["rejected"] += len(images)
+                raise Overloaded(f"Caption queue is full ({self.requests.maxsize} waiting)")
+            for image, future in zip(images, futures):
+                self.requests.put_nowait((image, streamer, future, now, max_batch))
+            self.counts["submitted"] += len(images)
+        return futures
+
+    def caption_many(self, images, timeout=300, max_batch=None):
+        futures = self.submit_all(images, max_batch=max_batch)
+        try:
+            return [f.result(timeout) for f in futures]
+        finally:
+            # After a timeout nobody waits for the rest; the worker skips them
+            for f in futures:
+                f.cancel()
+
+    def next_batch(self):
+        if self.held is not None:
+            batch, self.held = [self.held], None
+        else:
+            batch = [self.requests.get()]
+        if batch[0][1] is not None:
+            return batch  # Streaming requests run on their own
+        deadline = time.perf_counter() + self.max_wait
+        limit = batch[0][4] or self.max_batch
+        while len(batch) < limit:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[1] is not None:
+                self.held = item  # Runs on its own next round
+                break
+            batch.append(item)
+        return batch
+
+    def run(self):
+        set_threads(self.threads)
+        while True:
+            batch = self.next_batch()
+            live = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if len(live) < len(batch):
+                with self.lock:
+                    self.counts["cancelled"] += len(batch) - len(live)
+                batch = live
+                if not batch:
+                    continue
+            try:
+                if batch[0][1] is not None:
+                    image, streamer = batch[0][:2]
+                    captions = [generate_streaming(self.processor, self.model, image, streamer, self.max_new_tokens)]
+                else:
+                    captions = caption_images(self.processor, self.model, [item[0] for item in batch], self.max_new_tokens)
+            except Exception as e:
+                for _, streamer, future, _, _ in batch:
+                    if streamer is not None:
+                        streamer.end()
+                    future.set_exception(e)
+                with self.lock:
+                    self.counts["failed"] += len(batch)
+                continue
+
+            now = time.perf_counter()
+            with self.lock:
+                self.counts["batches"] += 1
+                self.counts["completed"] += len(batch)
+                self.batch_sizes.append(len(batch))
+                self.latencies.extend(now - item[3] for item in batch)
+            for (_, _, future, _, _), caption in zip(batch, captions):
+                future.set_result(caption)
+
+    def metrics(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            sizes = list(self.batch_sizes)
+            out = dict(self.counts)
+        out["queue_depth"] = self.requests.qsize() + (self.held is not None)
+        out["mean_batch_size"] = sum(sizes) / len(sizes) if sizes else 0.0
+        out["p50_latency_s"] = percentile(latencies, 50)
+        out["p95_latency_s"] = percentile(latencies, 95)
+        return out
+
+
+# --- Backend Report ---
+def word_overlap(a, b):
+    a, b = set(a.split()), set(b.split())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+def backend_report(images, backends=BACKENDS, compile_model=False, threads=None, max_new_tokens=50, loader=load_captioner):
+    # Latency per mode and how closely its captions match fp32 on `images`.
+    # With the default loader every backend gets its own throwaway model,
+    # released before the next one loads, never one an InferenceWorker owns.
+    set_threads(threads)
+    rows = []
+    reference = None
+    for backend in ("fp32",) + tuple(b for b in backends if b != "fp32"):
+        start = time.perf_counter()
+        processor, model = loader(backend, compile_model)
+        load_s = time.perf_counter() - start
+
+        caption_images(processor, model, images[:1], max_new_tokens)  # Warm-up
+        start = time.perf_counter()
+        captions = [caption_images(processor, model, [image], max_new_tokens)[0] for image in images]
+        per_image = (time.perf_counter() - start) / len(images)
+
+        del processor, model
+        gc.collect()
+
+        if reference is None:
+            reference = captions
+        rows.append({
+            "backend": backend + ("+compile" if compile_model else ""),
+            "load_s": round(load_s, 2),
+            "ms_per_image": round(per_image * 1000, 1),
+            "speedup": None,
+            "exact_match": sum(c == r for c, r in zip(captions, reference)) / len(images),
+            "word_overlap": sum(word_overlap(c, r) for c, r in zip(captions, reference)) / len(images),
+        })
+    for row in rows:
+        row["speedup"] = round(rows[0]["ms_per_image"] / row["ms_per_image"], 2)
+    return rows
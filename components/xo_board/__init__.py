@@ -0,0 +1,6 @@
+import os
+import streamlit.components.v1 as components
+
+# Whole XO board as a single widget (index.html). Declared here rather than in
+# the page script so it is registered once per process, under a module name.
+board_component = components.declare_component("xo_board", path=os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,313 @@
+from datetime import date, datetime
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import requests
+from http_client import shared_client
+
+# Columnar data prep and snapshot cache for pages/Covid.py (no Streamlit imports).
+
+API_URL = os.environ.get("COVID_API_URL", "https://disease.sh").rstrip("/")
+COUNTRIES_URL = f"{API_URL}/v3/covid-19/countries"
+HISTORICAL_URL = f"{API_URL}/v3/covid-19/historical"
+ARC_ORIGIN = [105, 35]  # [lon, lat] every arc starts from
+MIN_RADIUS = 100
+RADIUS_SPAN = 1000000 - 200000
+HISTORY_OVERLAP_DAYS = 7  # Re-asked on each update, for days published late
+
+
+def countries_frame(data):
+    # /countries JSON -> location, cases, latitude, longitude; rows missing
+    # any of cases/lat/long are dropped
+    raw = pd.DataFrame.from_records(data, columns=["country", "cases", "countryInfo"])
+    info = pd.DataFrame.from_records(
+        [i if isinstance(i, dict) else {} for i in raw["countryInfo"]], columns=["lat", "long"]
+    )
+    df = pd.DataFrame({
+        "location": raw["country"],
+        "cases": pd.to_numeric(raw["cases"], errors="coerce"),
+        "latitude": pd.to_numeric(info["lat"], errors="coerce"),
+        "longitude": pd.to_numeric(info["long"], errors="coerce"),
+    })
+    df = df[df[["cases", "latitude", "longitude"]].notna().all(axis=1)].reset_index(drop=True)
+    df["cases"] = df["cases"].astype(np.int64)
+    df["radius"] = scaled_radius(df["cases"].to_numpy())
+    return df
+
+def scaled_radius(cases):
+    # Min-max normalize case counts onto the bubble radius range
+    if len(cases) == 0:
+        return np.empty(0)
+    lo = cases.min()
+    span = cases.max() - lo
+    if span == 0:
+        return np.full(len(cases), float(MIN_RADIUS))
+    return MIN_RADIUS + (cases - lo) / span * RADIUS_SPAN
+
+def arc_frame(df):
+    # Arc targets only; the shared origin is a constant on the layer
+    return pd.DataFrame({"to_lon": df["longitude"].to_numpy(), "to_lat": df["latitude"].to_numpy()})
+
+
+# --- Snapshot Cache ---
+SNAPSHOT_COLUMNS = ("location", "cases", "latitude", "longitude", "radius")
+
+def save_snapshot(path, df, meta):
+    # Columnar .npz: one array per column plus JSON metadata; written to a
+    # temp file first so readers never see a partial snapshot
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            meta=np.array(json.dumps(meta)),
+            location=df["location"].to_numpy(dtype=str),
+            **{c: df[c].to_numpy() for c in SNAPSHOT_COLUMNS if c != "location"},
+        )
+    os.replace(tmp, path)
+
+def load_snapshot(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        df = pd.DataFrame({c: data[c] for c in SNAPSHOT_COLUMNS})
+    df["location"] = df["location"].astype(object)
+    return df, meta
+
+class CovidCache:
+    # Memory tier + on-disk snapshot. get() never waits on the network once
+    # any snapshot exists: data older than `ttl` is served as-is while one
+    # background thread revalidates it with ETag/If-Modified-Since.
+    def __init__(self, url=COUNTRIES_URL, path=None, ttl=600, timeout=(5, 15)):
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.df = None
+        self.meta = {}
+        self.error = None
+        self.refreshing = False
+        self.lock = threading.RLock()  # Also held through the first fetch, see get()
+        if path and os.path.exists(path):
+            try:
+                self.df, self.meta = load_snapshot(path)
+                self.meta["source"] = "snapshot"
+            except (OSError, ValueError, KeyError) as e:
+                self.error = f"Could not read snapshot: {e}"
+
+    def age(self):
+        fetched = self.meta.get("fetched_at")
+        return time.time() - fetched if fetched else float("inf")
+
+    def get(self):
+        if self.df is None:
+            # Nothing to show yet: the first fetch is synchronous, and sessions
+            # arriving meanwhile wait for it rather than fetching themselves
+            with self.lock:
+                if self.df is None:
+                    self.refresh()
+        elif self.age() > self.ttl:
+            self.refresh_in_background()
+        df = self.df if self.df is not None else pd.DataFrame()
+        return df, self.status()
+
+    def status(self):
+        return {
+            "age_s": self.age(),
+            "refreshing": self.refreshing,
+            "error": self.error,
+            "source": self.meta.get("source"),
+        }
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self.refresh, name="covid-refresh", daemon=True).start()
+
+    def refresh(self):
+        with self.lock:
+            self.refreshing = True
+        try:
+            headers = {}
+            if self.df is not None:
+                if self.meta.get("etag"):
+                    headers["If-None-Match"] = self.meta["etag"]
+                if self.meta.get("last_modified"):
+                    headers["If-Modified-Since"] = self.meta["last_modified"]
+            r = shared_client().get(self.url, headers=headers, timeout=self.timeout)
+
+            if r.status_code == 304:
+                meta = dict(self.meta, fetched_at=time.time(), source="revalidated")
+                df = self.df
+            elif r.status_code == 200:
+                df = countries_frame(r.json())
+                meta = {
+                    "fetched_at": time.time(),
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "source": "network",
+                }
+            else:
+                self.error = f"API request failed with status code {r.status_code}"
+                return
+
+            self.df, self.meta, self.error = df, meta, None
+            if self.path:
+                save_snapshot(self.path, df, meta)
+        except (requests.RequestException, ValueError, OSError) as e:
+            self.error = f"Connection error: {e}"
+        finally:
+            self.refreshing = False
+
+
+# --- Historical Time Series ---
+def historical_matrix(data):
+    # /historical JSON -> (ISO dates, countries, cases[day, country]);
+    # province rows are summed into their country
+    totals = {}
+    dates = None
+    for entry in data:
+        cases = (entry.get("timeline") or {}).get("cases") or {}
+        if not cases:
+            continue
+        if dates is None:
+            dates = list(cases)
+        values = np.fromiter((cases.get(d, 0) or 0 for d in dates), dtype=np.int64, count=len(dates))
+        name = entry.get("country")
+        totals[name] = totals[name] + values if name in totals else values
+    if not totals:
+        return [], [], np.zeros((0, 0), dtype=np.int64)
+    iso = [datetime.strptime(d, "%m/%d/%y").date().isoformat() for d in dates]
+    countries = sorted(totals)
+    return iso, countries, np.column_stack([totals[c] for c in countries])
+
+class CovidHistory:
+    # Cumulative cases per (day, country) in a raw row-major int64 file that
+    # is memory-mapped for reading. Days are appended in place, so an update
+    # only downloads and writes the days that are new since the last run.
+    def __init__(self, path, url=HISTORICAL_URL, ttl=12 * 3600, timeout=(5, 60)):
+        self.path = path
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.data_file = os.path.join(path, "cases.bin")
+        self.meta_file = os.path.join(path, "meta.json")
+        self.meta = {"dates": [], "countries": [], "checked_at": None}
+        self.cases = np.zeros((0, 0), dtype=np.int64)
+        self.error = None
+        self.updating = False
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # Held by update() while it writes the store
+        self.open()
+
+    def open(self):
+        if not (os.path.exists(self.meta_file) and os.path.exists(self.data_file)):
+            return
+        with open(self.meta_file) as f:
+            meta = json.load(f)
+        shape = (len(meta["dates"]), len(meta["countries"]))
+        # Shape comes from the metadata, so rows appended after it was written
+        # (an interrupted update) are not visible; the next update cuts them off
+        self.cases = np.memmap(self.data_file, dtype=np.int64, mode="r", shape=shape) if all(shape) else self.cases
+        self.meta = meta
+
+    def write_meta(self, meta):
+        tmp = f"{self.meta_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_file)
+
+    def ensure(self):
+        # Block only when there is nothing stored yet; otherwise refresh in
+        # the background once the last check is older than `ttl`
+        if not len(self.meta["dates"]):
+            self.update(only_if_empty=True)
+        elif time.time() - (self.meta.get("checked_at") or 0) > self.ttl:
+            with self.lock:
+                if self.updating:
+                    return
+                self.updating = True
+            threading.Thread(target=self.update, name="covid-history", daemon=True).start()
+
+    def update(self, only_if_empty=False):
+        # write_lock keeps updates from writing the store at the same time;
+        # with only_if_empty, a session that waited on another session's
+        # first download finds it stored and returns
+        with self.write_lock:
+            if only_if_empty and len(self.meta["dates"]):
+                return
+            with self.lock:
+                self.updating = True
+            try:
+                dates = self.meta["dates"]
+                if dates:
+                    missing = (date.today() - date.fromisoformat(dates[-1])).days
+                    if missing <= 0:
+                        self.write_meta(dict(self.meta, checked_at=time.time()))
+                        self.open()
+                        return
+                    # Only days published since the last check can be new, so ask
+                    # for those (plus an overlap) rather than everything after the
+                    # last stored day: a feed that stopped updating (disease.sh
+                    # did in 2023) would otherwise be downloaded whole every time
+                    checked = self.meta.get("checked_at")
+                    since_check = (date.today() - date.fromtimestamp(checked)).days if checked else missing
+                    lastdays = min(missing, since_check + HISTORY_OVERLAP_DAYS) + 1
+                else:
+                    lastdays = "all"
+                r = shared_client().get(self.url, params={"lastdays": lastdays}, timeout=self.timeout)
+                r.raise_for_status()
+                new_dates, countries, matrix = historical_matrix(r.json())
+                os.makedirs(self.path, exist_ok=True)
+
+                if not dates:
+                    with open(self.data_file, "wb") as f:
+                        f.write(np.ascontiguousarray(matrix).tobytes())
+                    meta = {"dates": new_dates, "countries": countries}
+                else:
+                    # Keep the stored country order; countries the store does not
+                    # know are ignored, missing ones carry their last value forward
+                    fresh = [i for i, d in enumerate(new_dates) if d > dates[-1]]
+                    column = {c: i for i, c in enumerate(countries)}
+                    rows = np.repeat(self.cases[-1:], len(fresh), axis=0)
+                    for j, name in enumerate(self.meta["countries"]):
+                        if name in column:
+                            rows[:, j] = matrix[fresh, column[name]]
+                    with open(self.data_file, "r+b") as f:
+                        # Drop rows an interrupted update left past the stored ones
+                        f.truncate(len(dates) * len(self.meta["countries"]) * self.cases.itemsize)
+                        f.seek(0, os.SEEK_END)
+                        f.write(np.ascontiguousarray(rows).tobytes())
+                    meta = {"dates": dates + [new_dates[i] for i in fresh], "countries": self.meta["countries"]}
+
+                meta["checked_at"] = time.time()
+                self.write_meta(meta)
+                self.open()
+                self.error = None
+            except (requests.RequestException, ValueError, OSError) as e:
+                self.error = f"History update failed: {e}"
+            finally:
+                self.updating = False
+
+    def coordinates(self, current):
+        # Align the stored countries with lat/long from the /countries frame;
+        # returns (column indices with coordinates, their frame rows)
+        lookup = current.set_index("location")[["latitude", "longitude"]]
+        names = pd.Index(self.meta["countries"])
+        keep = np.flatnonzero(names.isin(lookup.index))
+        return keep, lookup.loc[names[keep]].reset_index()
+
+def timeline_frame(frame, cases, max_cases):
+    # One map frame: a single day's row sliced from the memmap, scaled
+    # against the whole series so bubbles grow over time, written into the
+    # cases/radius columns of `frame` in place (a per-run copy of the place
+    # rows), so stepping through days builds no new DataFrame. O(countries),
+    # independent of how many days are stored.
+    cases = np.asarray(cases)
+    frame["cases"] = cases
+    frame["radius"] = MIN_RADIUS + cases / max_cases * RADIUS_SPAN if max_cases else float(MIN_RADIUS)
+    return frame
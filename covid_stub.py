@@ -0,0 +1,96 @@
+import argparse
+import hashlib
+import json
+import threading
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for disease.sh so the COVID page can run offline:
+#
+#   python covid_stub.py --port 8765
+#   COVID_API_URL=http://127.0.0.1:8765 streamlit run main.py
+#
+# Serves /countries (with ETag / If-None-Match and Last-Modified /
+# If-Modified-Since) and /historical?lastdays=N.
+
+COUNTRIES = [
+    {"country": "Thailand", "cases": 4_728_182, "countryInfo": {"lat": 15, "long": 100}},
+    {"country": "Japan", "cases": 33_803_572, "countryInfo": {"lat": 36, "long": 138}},
+    {"country": "France", "cases": 40_138_560, "countryInfo": {"lat": 46, "long": 2}},
+    {"country": "Brazil", "cases": 38_743_918, "countryInfo": {"lat": -10, "long": -55}},
+    {"country": "USA", "cases": 111_820_082, "countryInfo": {"lat": 38, "long": -97}},
+    {"country": "Kenya", "cases": 344_106, "countryInfo": {"lat": 1, "long": 38}},
+    {"country": "Nowhere", "cases": 10, "countryInfo": {}},
+]
+LAST_MODIFIED = formatdate(0, usegmt=True)
+HISTORY_DAYS = 90
+
+
+def historical(lastdays="all"):
+    # Linear growth up to each country's current total, ending yesterday
+    end = date.today() - timedelta(days=1)
+    days = [end - timedelta(days=HISTORY_DAYS - 1 - i) for i in range(HISTORY_DAYS)]
+    if lastdays != "all":
+        days = days[-max(1, int(lastdays)):]
+    return [
+        {
+            "country": c["country"],
+            "province": None,
+            "timeline": {"cases": {
+                f"{d.month}/{d.day}/{d:%y}": c["cases"] * (HISTORY_DAYS - (end - d).days) // HISTORY_DAYS
+                for d in days
+            }},
+        }
+        for c in COUNTRIES
+    ]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    routes = {"/v3/covid-19/countries": COUNTRIES}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/v3/covid-19/historical":
+            payload = historical(parse_qs(url.query).get("lastdays", ["30"])[0])
+        else:
+            payload = self.routes.get(url.path)
+        if payload is None:
+            self.send_error(404)
+            return
+        body = json.dumps(payload).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag or (
+            "If-None-Match" not in self.headers and self.headers.get("If-Modified-Since") == LAST_MODIFIED
+        ):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0, host="127.0.0.1"):
+    # Start in a daemon thread; returns (server, base_url). port=0 picks a free one.
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve canned disease.sh responses")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Serving on http://127.0.0.1:{args.port}")
+    server.serve_forever()
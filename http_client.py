@@ -0,0 +1,155 @@
+from collections import deque
+from urllib.parse import urlsplit
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from perf import percentile, span
+
+# Shared HTTP layer for the networked pages (Covid, command prompts).
+# One keep-alive requests.Session per host, default connect/read timeouts,
+# bounded retries with backoff, a per-host circuit breaker and per-endpoint
+# latency/error metrics.
+
+DEFAULT_TIMEOUT = (5, 15)  # (connect, read) seconds
+
+
+class CircuitOpen(requests.ConnectionError):
+    pass
+
+
+class Breaker:
+    # Opens after `threshold` consecutive failures; after `reset_after`
+    # seconds one trial request is let through (half-open)
+    def __init__(self, threshold=5, reset_after=30):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            self.opened_at = time.monotonic()  # One trial per reset window
+            return True
+        return False
+
+    def record(self, ok):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=2, backoff=0.3, pool_size=10,
+                 breaker_threshold=5, breaker_reset=30):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.sessions = {}
+        self.breakers = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def session(self, host):
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                # Connection failures are retried for every method (nothing
+                # was sent); read/5xx retries only for idempotent methods, so
+                # a POSTed command is never replayed
+                retry = Retry(
+                    total=self.retries,
+                    connect=self.retries,
+                    read=self.retries,
+                    status=self.retries,
+                    status_forcelist=(502, 503, 504),
+                    backoff_factor=self.backoff,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[host] = session
+                self.breakers[host] = Breaker(self.breaker_threshold, self.breaker_reset)
+            return session
+
+    def request(self, method, url, **kwargs):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        endpoint = f"{method.upper()} {host}{parts.path or '/'}"
+        session = self.session(host)
+        breaker = self.breakers[host]
+
+        with self.lock:
+            allowed = breaker.allow()
+        if not allowed:
+            self.record(endpoint, 0.0, error=True)
+            raise CircuitOpen(f"{host} is failing, not retrying for {self.breaker_reset}s")
+
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            with span("http"):
+                response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self.lock:
+                breaker.record(False)
+            self.record(endpoint, time.perf_counter() - start, error=True)
+            raise
+        ok = response.status_code < 500
+        with self.lock:
+            breaker.record(ok)
+        self.record(endpoint, time.perf_counter() - start, error=not ok)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def record(self, endpoint, seconds, error=False):
+        with self.lock:
+            stat = self.stats.get(endpoint)
+            if stat is None:
+                stat = self.stats[endpoint] = {"calls": 0, "errors": 0, "latencies": deque(maxlen=256)}
+            stat["calls"] += 1
+            stat["errors"] += error
+            stat["latencies"].append(seconds)
+
+    def metrics(self):
+        # {endpoint: calls, errors, p50/p95 latency in ms}
+        out = {}
+        with self.lock:
+            for endpoint, stat in self.stats.items():
+                latencies = stat["latencies"]
+                out[endpoint] = {
+                    "calls": stat["calls"],
+                    "errors": stat["errors"],
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                }
+        return out
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def shared_client():
+    # One client per process, shared by every page and session
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
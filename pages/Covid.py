@@ -1,111 +1,182 @@
-import streamlit as st
-import pandas as pd
-import pydeck as pdk
-import numpy as np
-import requests
-from urllib.error import URLError
-
-
-@st.cache_data
-def fetch_covid():
-    url = "https://disease.sh/v3/covid-19/countries"
-    r = requests.get(url)
-    if r.status_code != 200:
-        st.error(f"API request failed with status code {r.status_code}")
-        return pd.DataFrame()
-    data = r.json()
-    rows = []
-    for country in data:
-        cases = country.get("cases")
-        name = country.get("country")
-        coord = country.get("countryInfo", {})
-        lat = coord.get("lat")
-        lng = coord.get("long")
-        if lat is not None and lng is not None and cases is not None:
-            rows.append({
-                "location": name,
-                "cases": cases,
-                "latitude": lat,
-                "longitude": lng,
-            })
-    df = pd.DataFrame(rows)
-
-    # Normalize radius from 100 to 100000
-    min_cases = df["cases"].min()
-    max_cases = df["cases"].max()
-    df["radius"] = 100 + (df["cases"] - min_cases) / (max_cases - min_cases) * (1000000 - 200000)
-
-    return df
-
-
-try:
-    df = fetch_covid()
-
-    if df.empty:
-        st.error("No data to display.")
-    else:
-        st.title("🌍 Global COVID Map with Arcs and Scaled Bubbles")
-        sidebar = st.sidebar
-        show_bubbles = sidebar.checkbox("Show red case bubbles", True)
-        show_labels = sidebar.checkbox("Show country names", True)
-        show_arcs = sidebar.checkbox("Show jumping arc lines", True)
-
-        layers = []
-
-        if show_bubbles:
-            layers.append(pdk.Layer(
-                "ScatterplotLayer",
-                data=df,
-                get_position=["longitude", "latitude"],
-                get_color="[200, 30, 0, 140]",  # red semi-transparent
-                get_radius="radius",
-                pickable=True,
-            ))
-
-        if show_labels:
-            layers.append(pdk.Layer(
-                "TextLayer",
-                data=df,
-                get_position=["longitude", "latitude"],
-                get_text="location",
-                get_color=[0, 0, 0],
-                get_size=12,
-                get_alignment_baseline="'bottom'",
-            ))
-
-        if show_arcs:
-            arc_data = pd.DataFrame([{
-                "from_lon": 105 ,
-                "from_lat": 35,
-                "to_lon": row["longitude"],
-                "to_lat": row["latitude"],
-            } for _, row in df.iterrows()])
-
-            layers.append(pdk.Layer(
-                "ArcLayer",
-                data=arc_data,
-                get_source_position=["from_lon", "from_lat"],
-                get_target_position=["to_lon", "to_lat"],
-                get_source_color=[0, 0, 255, 120],   # blue
-                get_target_color=[255, 0, 0, 160],   # red
-                get_width=2,
-                pickable=False,
-            ))
-
-        if layers:
-            st.pydeck_chart(pdk.Deck(
-                map_style="light",
-                initial_view_state={
-                    "latitude": 20,
-                    "longitude": 0,
-                    "zoom": 1.2,
-                    "pitch": 30,
-                },
-                layers=layers,
-                tooltip={"text": "{location}\nCases: {cases}"},
-            ))
-        else:
-            st.error("Enable at least one layer to visualize data.")
-
-except URLError as e:
-    st.error(f"Connection error: {e.reason}")
+import streamlit as st
+import os
+import time
+from datetime import date, timedelta
+import perf
+import pydeck as pdk
+from urllib.error import URLError
+from covid_data import ARC_ORIGIN, CovidCache, CovidHistory, arc_frame, timeline_frame
+
+perf.start_page("Covid")
+
+
+# Process-wide: memory tier over an on-disk snapshot, refreshed in the background
+@perf.cache_resource
+def get_covid_cache():
+    return CovidCache(
+        path=os.environ.get("COVID_SNAPSHOT", os.path.join(".cache", "covid_countries.npz")),
+        ttl=int(os.environ.get("COVID_TTL", "600")),
+    )
+
+def fetch_covid():
+    with perf.span("fetch_covid"):
+        return get_covid_cache().get()
+
+# Day x country cases, memory-mapped from .cache/covid_history
+@perf.cache_resource
+def get_covid_history():
+    return CovidHistory(os.environ.get("COVID_HISTORY_DIR", os.path.join(".cache", "covid_history")))
+
+# Countries of the history store that have coordinates; rebuilt only when
+# the current snapshot or the stored country list changes
+@perf.cache_resource(max_entries=4)
+def history_places(df, countries):
+    keep, places = get_covid_history().coordinates(df)
+    return keep, places
+
+def timeline_deck(layers):
+    return pdk.Deck(
+        map_style="light",
+        initial_view_state={"latitude": 20, "longitude": 0, "zoom": 1.2, "pitch": 30},
+        layers=layers,
+        tooltip={"text": "{location}\nCases: {cases}"},
+    )
+
+def show_timeline(df, show_labels):
+    history = get_covid_history()
+    with st.spinner("Loading history..."):
+        history.ensure()
+    if history.error:
+        st.warning(history.error)
+    dates = history.meta["dates"]
+    if not dates:
+        st.error("No historical data to display.")
+        return
+
+    keep, places = history_places(df, tuple(history.meta["countries"]))
+    cases = history.cases
+    max_cases = int(cases[-1, keep].max()) if len(keep) else 0
+    first, last = date.fromisoformat(dates[0]), date.fromisoformat(dates[-1])
+    labels = covid_layers(df)["labels"] if show_labels else None
+    # `places` is shared by every session; frames are written into a copy
+    data = places.copy()
+
+    def frame(idx):
+        timeline_frame(data, cases[idx, keep], max_cases)
+        layers = [pdk.Layer(
+            "ScatterplotLayer",
+            data=data,
+            get_position=["longitude", "latitude"],
+            get_color="[200, 30, 0, 140]",
+            get_radius="radius",
+            pickable=True,
+        )]
+        if labels is not None:
+            layers.append(labels)
+        return timeline_deck(layers)
+
+    day = st.slider("Day", first, last, last, timedelta(days=1), format="YYYY-MM-DD")
+    chart = st.empty()
+    if st.button("\u25B6\uFE0F Play"):
+        # About 120 frames whatever the series length
+        start = (day - first).days if day < last else 0
+        stride = max(1, (len(dates) - start) // 120)
+        for idx in list(range(start, len(dates), stride)) + [len(dates) - 1]:
+            chart.pydeck_chart(frame(idx))
+            time.sleep(0.05)
+    else:
+        chart.pydeck_chart(frame((day - first).days))
+
+
+# Layers are built once per dataset; toggling a checkbox only picks from them
+@perf.cache_resource(max_entries=4)
+def covid_layers(df):
+    return {
+        "bubbles": pdk.Layer(
+            "ScatterplotLayer",
+            data=df[["location", "cases", "latitude", "longitude", "radius"]],
+            get_position=["longitude", "latitude"],
+            get_color="[200, 30, 0, 140]",  # red semi-transparent
+            get_radius="radius",
+            pickable=True,
+        ),
+        "labels": pdk.Layer(
+            "TextLayer",
+            data=df[["location", "latitude", "longitude"]],
+            get_position=["longitude", "latitude"],
+            get_text="location",
+            get_color=[0, 0, 0],
+            get_size=12,
+            get_alignment_baseline="'bottom'",
+        ),
+        "arcs": pdk.Layer(
+            "ArcLayer",
+            data=arc_frame(df),
+            get_source_position=ARC_ORIGIN,
+            get_target_position=["to_lon", "to_lat"],
+            get_source_color=[0, 0, 255, 120],   # blue
+            get_target_color=[255, 0, 0, 160],   # red
+            get_width=2,
+            pickable=False,
+        ),
+    }
+
+
+try:
+    df, status = fetch_covid()
+
+    if status["error"]:
+        # Still render the last good snapshot when there is one
+        (st.warning if not df.empty else st.error)(status["error"])
+
+    if df.empty:
+        st.error("No data to display.")
+    else:
+        st.title("🌍 Global COVID Map with Arcs and Scaled Bubbles")
+        st.caption(
+            f"Data fetched {status['age_s'] / 60:.0f} min ago ({status['source']})"
+            + (" · refreshing in background" if status["refreshing"] else "")
+        )
+        sidebar = st.sidebar
+        view = sidebar.radio("View", ["Current totals", "Time series"])
+        show_bubbles = sidebar.checkbox("Show red case bubbles", True)
+        show_labels = sidebar.checkbox("Show country names", True)
+        show_arcs = sidebar.checkbox("Show jumping arc lines", True)
+
+        if view == "Time series":
+            show_timeline(df, show_labels)
+            perf.finish_page()
+            st.stop()
+
+        prepared = covid_layers(df)
+        layers = []
+
+        if show_bubbles:
+            layers.append(prepared["bubbles"])
+
+        if show_labels:
+            layers.append(prepared["labels"])
+
+        if show_arcs:
+            layers.append(prepared["arcs"])
+
+        if layers:
+            st.pydeck_chart(pdk.Deck(
+                map_style="light",
+                initial_view_state={
+                    "latitude": 20,
+                    "longitude": 0,
+                    "zoom": 1.2,
+                    "pitch": 30,
+                },
+                layers=layers,
+                tooltip={"text": "{location}\nCases: {cases}"},
+            ))
+        else:
+            st.error("Enable at least one layer to visualize data.")
+
+except URLError as e:
+    st.error(f"Connection error: {e.reason}")
+
+perf.finish_page()
+
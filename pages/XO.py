@@ -1,229 +1,320 @@
-import streamlit as st
-import random
-
-# --- Utility Functions ---
-def get_board_size():
-    return int(st.session_state.board_size.split("x")[0])
-
-def available_moves(board):
-    return [i for i, v in enumerate(board) if v == ""]
-
-def check_winner(board):
-    size = get_board_size()
-    lines = []
-
-    for i in range(size):
-        lines.append([i * size + j for j in range(size)])  # Row
-        lines.append([j * size + i for j in range(size)])  # Column
-
-    lines.append([i * size + i for i in range(size)])  # Diagonal TL-BR
-    lines.append([i * size + (size - 1 - i) for i in range(size)])  # Diagonal TR-BL
-
-    for line in lines:
-        if board[line[0]] != "" and all(board[i] == board[line[0]] for i in line):
-            return board[line[0]]
-
-    if all(cell != "" for cell in board):
-        return "Draw"
-    return None
-
-def minimax(board, depth, is_max, alpha, beta):
-    winner = check_winner(board)
-    if winner == "O":
-        return 1
-    elif winner == "X":
-        return -1
-    elif winner == "Draw":
-        return 0
-
-    if is_max:
-        best = -float("inf")
-        for move in available_moves(board):
-            board[move] = "O"
-            val = minimax(board, depth + 1, False, alpha, beta)
-            board[move] = ""
-            best = max(best, val)
-            alpha = max(alpha, best)
-            if beta <= alpha:
-                break
-        return best
-    else:
-        best = float("inf")
-        for move in available_moves(board):
-            board[move] = "X"
-            val = minimax(board, depth + 1, True, alpha, beta)
-            board[move] = ""
-            best = min(best, val)
-            beta = min(beta, best)
-            if beta <= alpha:
-                break
-        return best
-
-def best_move():
-    size = get_board_size()
-    if size != 3:
-        return random.choice(available_moves(st.session_state.board))
-
-    best_val = -float("inf")
-    move = None
-    for i in available_moves(st.session_state.board):
-        st.session_state.board[i] = "O"
-        move_val = minimax(st.session_state.board, 0, False, -float("inf"), float("inf"))
-        st.session_state.board[i] = ""
-        if move_val > best_val:
-            best_val = move_val
-            move = i
-    return move
-
-def reset_game():
-    size = get_board_size()
-    st.session_state.board = [""] * (size * size)
-    st.session_state.winner = None
-    st.session_state.current_player = "X" if st.session_state.first_player == "You (X)" else "O"
-    st.session_state.history = []
-
-def apply_move(idx):
-    if st.session_state.board[idx] == "" and not st.session_state.winner:
-        st.session_state.history.append(st.session_state.board[:])
-        st.session_state.board[idx] = st.session_state.current_player
-        st.session_state.winner = check_winner(st.session_state.board)
-        if st.session_state.winner:
-            st.session_state.scores[st.session_state.winner] += 1
-            st.session_state.game_running = False
-        else:
-            st.session_state.current_player = "O" if st.session_state.current_player == "X" else "X"
-
-def auto_ai_turn():
-    if st.session_state.winner or not st.session_state.game_running:
-        return
-    if st.session_state.current_player == "O":
-        move = best_move()
-        if move is not None:
-            apply_move(move)
-
-# --- Session State Initialization ---
-if "board" not in st.session_state:
-    st.session_state.board = [""] * 9
-if "winner" not in st.session_state:
-    st.session_state.winner = None
-if "current_player" not in st.session_state:
-    st.session_state.current_player = "X"
-if "first_player" not in st.session_state:
-    st.session_state.first_player = "You (X)"
-if "game_running" not in st.session_state:
-    st.session_state.game_running = False
-if "mode" not in st.session_state:
-    st.session_state.mode = "Player vs AI"
-if "history" not in st.session_state:
-    st.session_state.history = []
-if "scores" not in st.session_state:
-    st.session_state.scores = {"X": 0, "O": 0, "Draw": 0}
-if "difficulty" not in st.session_state:
-    st.session_state.difficulty = "Normal"
-if "board_size" not in st.session_state:
-    st.session_state.board_size = "3x3"
-if "last_board_size" not in st.session_state:
-    st.session_state.last_board_size = st.session_state.board_size
-
-# --- Detect Board Size Change ---
-if st.session_state.board_size != st.session_state.last_board_size:
-    st.session_state.last_board_size = st.session_state.board_size
-    reset_game()
-
-# --- UI ---
-st.set_page_config(page_title="Tic-Tac-Toe", layout="centered")
-st.title("\U0001F3AE Minimax Tic-Tac-Toe")
-st.caption("ver 3")
-
-with st.sidebar:
-    st.header("Game Settings")
-    disable_inputs = st.session_state.game_running
-
-    st.session_state.mode = st.radio(
-        "Game Mode",
-        ["Player vs AI", "Player vs Player"],
-        disabled=disable_inputs
-    )
-
-    st.selectbox(
-        "First Turn",
-        ["You (X)", "AI (O)"],
-        index=0 if st.session_state.first_player == "You (X)" else 1,
-        key="first_player",
-        disabled=disable_inputs or st.session_state.mode != "Player vs AI"
-    )
-
-    st.selectbox(
-        "AI Difficulty",
-        ["Easy", "Normal", "Hard"],
-        index=["Easy", "Normal", "Hard"].index(st.session_state.difficulty),
-        key="difficulty",
-        disabled=disable_inputs or st.session_state.mode != "Player vs AI"
-    )
-
-    st.selectbox(
-        "Board Size",
-        ["3x3", "6x6", "9x9"],
-        index=["3x3", "6x6", "9x9"].index(st.session_state.board_size),
-        key="board_size",
-        disabled=disable_inputs
-    )
-
-    if not st.session_state.game_running:
-        if st.button("\u25B6\uFE0F Start"):
-            reset_game()
-            st.session_state.game_running = True
-            st.rerun()
-    else:
-        if st.button("\u23F9 Stop"):
-            st.session_state.game_running = False
-            reset_game()
-            st.rerun()
-
-    if st.session_state.mode == "Player vs Player":
-        st.button("\u21A9\uFE0F Undo", disabled=not st.session_state.game_running or not st.session_state.history)
-    else:
-        st.button("\u21A9\uFE0F Undo", disabled=True)
-
-    st.markdown("### Score")
-    st.write(f"You (X): {st.session_state.scores['X']}")
-    st.write(f"AI (O): {st.session_state.scores['O']}")
-    st.write(f"Draws: {st.session_state.scores['Draw']}")
-
-# --- Style ---
-st.markdown("""
-    <style>
-    div.stButton > button {
-        height: 60px;
-        width: 60px;
-        font-size: 24px !important;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- Draw Game Board ---
-size = get_board_size()
-for i in range(size):
-    cols = st.columns(size)
-    for j in range(size):
-        idx = i * size + j
-        if idx < len(st.session_state.board):
-            with cols[j]:
-                if st.button(st.session_state.board[idx] or " ", key=f"cell{idx}"):
-                    if st.session_state.game_running and st.session_state.board[idx] == "" and not st.session_state.winner:
-                        apply_move(idx)
-                        st.rerun()
-
-# --- AI Turn ---
-if st.session_state.mode == "Player vs AI" and st.session_state.current_player == "O" and st.session_state.game_running:
-    auto_ai_turn()
-    st.rerun()
-
-# --- Game Status ---
-if st.session_state.winner:
-    if st.session_state.winner == "Draw":
-        st.success("It's a draw!")
-    else:
-        st.success(f"{st.session_state.winner} wins!")
-else:
-    st.info(f"Turn: {st.session_state.current_player}")
+import streamlit as st
+import multiprocessing
+import os
+import perf
+from concurrent.futures import ProcessPoolExecutor
+from components.xo_board import board_component
+from xo_engine import DIFFICULTY_BUDGETS, GameState, MovePool, TranspositionTable, choose_move
+from xo_table import SolvedTable
+
+perf.start_page("XO")
+
+# Shared by every session on the server, keyed by canonical (symmetry-folded) position
+@perf.cache_resource
+def get_transposition_table():
+    return TranspositionTable(maxsize=200_000)
+
+# Precomputed 3x3 answers (see xo_table.py), mapped once per process
+@perf.cache_resource
+def get_solved_table():
+    try:
+        return SolvedTable.load()
+    except (OSError, ValueError):
+        return None
+
+# One MCTS worker process per core, shared by every session. Not forked:
+# forking the multi-threaded server (maybe with torch loaded) can deadlock
+# the children, so they start from a clean forkserver/spawn process
+@perf.cache_resource
+def get_process_pool():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context(method))
+
+# Background AI moves for every session: bounded so slow searches cannot
+# pile up CPU work on the server. Only two threads: minimax is pure Python
+# and holds the GIL, so more threads would just split one core between
+# searches (and the server) and, with wall-clock budgets, make every move
+# weaker. The second thread lets a search overlap with an MCTS move, which
+# mostly waits on the process pool.
+@perf.cache_resource
+def get_move_pool():
+    return MovePool(max_workers=2, max_pending=8)
+
+# How long a run waits for the AI move it queued. Table lookups and Easy or
+# Normal searches finish within it and are applied in that same run; only
+# longer searches are left to the ai_thinking fragment.
+INLINE_WAIT = 0.1
+
+# --- Utility Functions ---
+def get_board_size():
+    return int(st.session_state.board_size.split("x")[0])
+
+def reset_game():
+    size = get_board_size()
+    st.session_state.board = [""] * (size * size)
+    st.session_state.game_state = GameState(size)
+    st.session_state.winner = None
+    st.session_state.current_player = "X" if st.session_state.first_player == "You (X)" else "O"
+    st.session_state.history = []
+    st.session_state.game_id += 1
+    cancel_ai_turn()
+
+def apply_move(idx):
+    if st.session_state.board[idx] == "" and not st.session_state.winner:
+        st.session_state.history.append(st.session_state.board[:])
+        st.session_state.board[idx] = st.session_state.current_player
+        st.session_state.winner = st.session_state.game_state.make(idx, st.session_state.current_player)
+        if st.session_state.winner:
+            st.session_state.scores[st.session_state.winner] += 1
+            st.session_state.game_running = False
+        else:
+            st.session_state.current_player = "O" if st.session_state.current_player == "X" else "X"
+
+def start_ai_turn():
+    # Queue the AI move on the shared pool and apply it right away if it is
+    # done within INLINE_WAIT; otherwise collect_ai_turn picks it up later.
+    # False when nothing was queued (no AI turn, or the pool is full).
+    if st.session_state.ai_job is not None or st.session_state.winner or not st.session_state.game_running:
+        return False
+    time_budget, _ = DIFFICULTY_BUDGETS[st.session_state.difficulty]
+    job = st.session_state.ai_job = get_move_pool().submit(
+        choose_move,
+        st.session_state.game_state.board.copy(),
+        "O",
+        st.session_state.difficulty,
+        st.session_state.ai_engine,
+        tt=get_transposition_table(),
+        table=get_solved_table(),
+        executor=get_process_pool(),
+        deadline=2 * time_budget + 0.5,
+        tag=st.session_state.game_id,
+    )
+    if job is None:
+        return False
+    if job.wait(INLINE_WAIT):
+        collect_ai_turn()
+    return True
+
+def collect_ai_turn():
+    job = st.session_state.ai_job
+    if job is None or not job.done():
+        return
+    st.session_state.ai_job = None
+    if job.tag == st.session_state.game_id and not job.future.cancelled():
+        result = job.result()
+        st.session_state.ai_stats = result.info
+        if result.move is not None and st.session_state.current_player == "O":
+            apply_move(result.move)
+
+def cancel_ai_turn():
+    if st.session_state.get("ai_job") is not None:
+        st.session_state.ai_job.cancel()
+        st.session_state.ai_job = None
+
+def handle_click(idx):
+    # Human move, then the AI reply in the same run (or queued, if slow)
+    if st.session_state.ai_job is not None:
+        return
+    if st.session_state.game_running and st.session_state.board[idx] == "" and not st.session_state.winner:
+        apply_move(idx)
+        if st.session_state.mode == "Player vs AI":
+            start_ai_turn()
+
+# --- Session State Initialization ---
+if "board" not in st.session_state:
+    st.session_state.board = [""] * 9
+if "game_state" not in st.session_state:
+    st.session_state.game_state = GameState.from_cells(st.session_state.board)
+if "winner" not in st.session_state:
+    st.session_state.winner = None
+if "current_player" not in st.session_state:
+    st.session_state.current_player = "X"
+if "first_player" not in st.session_state:
+    st.session_state.first_player = "You (X)"
+if "game_running" not in st.session_state:
+    st.session_state.game_running = False
+if "mode" not in st.session_state:
+    st.session_state.mode = "Player vs AI"
+if "history" not in st.session_state:
+    st.session_state.history = []
+if "scores" not in st.session_state:
+    st.session_state.scores = {"X": 0, "O": 0, "Draw": 0}
+if "difficulty" not in st.session_state:
+    st.session_state.difficulty = "Normal"
+if "ai_engine" not in st.session_state:
+    st.session_state.ai_engine = "Minimax"
+if "ai_stats" not in st.session_state:
+    st.session_state.ai_stats = ""
+if "game_id" not in st.session_state:
+    st.session_state.game_id = 0
+if "ai_job" not in st.session_state:
+    st.session_state.ai_job = None
+if "board_render" not in st.session_state:
+    st.session_state.board_render = "Grid"
+if "last_click" not in st.session_state:
+    st.session_state.last_click = None
+if "board_size" not in st.session_state:
+    st.session_state.board_size = "3x3"
+if "last_board_size" not in st.session_state:
+    st.session_state.last_board_size = st.session_state.board_size
+
+# --- Detect Board Size Change ---
+if st.session_state.board_size != st.session_state.last_board_size:
+    st.session_state.last_board_size = st.session_state.board_size
+    reset_game()
+
+# --- Handle Finished AI Move / Grid Click / AI Turn ---
+# Applied before anything is drawn, so this run already shows the result
+collect_ai_turn()
+
+click = st.session_state.get("board_grid")
+if click and click.get("nonce") != st.session_state.last_click:
+    st.session_state.last_click = click.get("nonce")
+    handle_click(click["idx"])
+
+if st.session_state.mode == "Player vs AI" and st.session_state.current_player == "O" and st.session_state.game_running:
+    start_ai_turn()
+
+# --- UI ---
+st.set_page_config(page_title="Tic-Tac-Toe", layout="centered")
+st.title("\U0001F3AE Minimax Tic-Tac-Toe")
+st.caption("ver 3")
+
+with st.sidebar:
+    st.header("Game Settings")
+    disable_inputs = st.session_state.game_running
+
+    st.session_state.mode = st.radio(
+        "Game Mode",
+        ["Player vs AI", "Player vs Player"],
+        disabled=disable_inputs
+    )
+
+    st.selectbox(
+        "First Turn",
+        ["You (X)", "AI (O)"],
+        index=0 if st.session_state.first_player == "You (X)" else 1,
+        key="first_player",
+        disabled=disable_inputs or st.session_state.mode != "Player vs AI"
+    )
+
+    st.selectbox(
+        "AI Difficulty",
+        ["Easy", "Normal", "Hard"],
+        index=["Easy", "Normal", "Hard"].index(st.session_state.difficulty),
+        key="difficulty",
+        disabled=disable_inputs or st.session_state.mode != "Player vs AI"
+    )
+
+    st.selectbox(
+        "AI Engine",
+        ["Minimax", "MCTS"],
+        index=["Minimax", "MCTS"].index(st.session_state.ai_engine),
+        key="ai_engine",
+        disabled=disable_inputs or st.session_state.mode != "Player vs AI"
+    )
+
+    st.radio(
+        "Board Render",
+        ["Grid", "Buttons"],
+        key="board_render",
+        horizontal=True,
+    )
+
+    st.selectbox(
+        "Board Size",
+        ["3x3", "6x6", "9x9"],
+        index=["3x3", "6x6", "9x9"].index(st.session_state.board_size),
+        key="board_size",
+        disabled=disable_inputs
+    )
+
+    if not st.session_state.game_running:
+        if st.button("\u25B6\uFE0F Start"):
+            reset_game()
+            st.session_state.game_running = True
+            st.rerun()
+    else:
+        if st.button("\u23F9 Stop"):
+            cancel_ai_turn()
+            st.session_state.game_running = False
+            reset_game()
+            st.rerun()
+
+    if st.session_state.mode == "Player vs Player":
+        st.button("\u21A9\uFE0F Undo", disabled=not st.session_state.game_running or not st.session_state.history)
+    else:
+        st.button("\u21A9\uFE0F Undo", disabled=True)
+
+    st.markdown("### Score")
+    st.write(f"You (X): {st.session_state.scores['X']}")
+    st.write(f"AI (O): {st.session_state.scores['O']}")
+    st.write(f"Draws: {st.session_state.scores['Draw']}")
+
+    if st.session_state.ai_stats:
+        st.caption(st.session_state.ai_stats)
+
+# --- Style ---
+st.markdown("""
+    <style>
+    div.stButton > button {
+        height: 60px;
+        width: 60px;
+        font-size: 24px !important;
+    }
+    </style>
+""", unsafe_allow_html=True)
+
+# --- Draw Game Board ---
+size = get_board_size()
+if st.session_state.board_render == "Grid":
+    board_component(
+        cells=st.session_state.board,
+        size=size,
+        cell_px=60 if size == 3 else 44 if size == 6 else 36,
+        disabled=not st.session_state.game_running or bool(st.session_state.winner) or st.session_state.ai_job is not None,
+        key="board_grid",
+        default=None,
+    )
+else:
+    for i in range(size):
+        cols = st.columns(size)
+        for j in range(size):
+            idx = i * size + j
+            if idx < len(st.session_state.board):
+                with cols[j]:
+                    st.button(st.session_state.board[idx] or " ", key=f"cell{idx}", on_click=handle_click, args=(idx,))
+
+# --- Game Status ---
+@st.fragment(run_every=0.1)
+def ai_thinking():
+    # Polls only while a slow move is pending; a finished move reruns the page
+    job = st.session_state.ai_job
+    if job is None or job.done():
+        st.rerun()
+    if job.expired():
+        job.stop.set()  # Past its deadline: take the best move found so far
+    st.info("AI is thinking...")
+
+@st.fragment(run_every=0.5)
+def ai_busy():
+    # Move pool was full; keep offering the move until a slot frees up
+    if start_ai_turn():
+        st.rerun()
+    st.warning("AI is busy, waiting for a free slot...")
+
+ai_waiting = st.session_state.mode == "Player vs AI" and st.session_state.current_player == "O" and st.session_state.game_running
+
+if st.session_state.ai_job is not None:
+    ai_thinking()
+elif ai_waiting and not st.session_state.winner:
+    ai_busy()
+elif st.session_state.winner:
+    if st.session_state.winner == "Draw":
+        st.success("It's a draw!")
+    else:
+        st.success(f"{st.session_state.winner} wins!")
+else:
+    st.info(f"Turn: {st.session_state.current_player}")
+
+perf.finish_page()
@@ -1,36 +1,109 @@
 import streamlit as st
-from PIL import Image
-from transformers import BlipProcessor, BlipForConditionalGeneration
-import torch
+import os
+import time
+import perf
+from captioner import BACKENDS, CaptionCache, Overloaded, backend_report, batched, caption_images_cached, caption_stream, image_key, load_image, model_tag
+from warmup import DEFAULT_THREADS, get_inference_worker, load_model
 
 # Set page config at the very top
 st.set_page_config(page_title="AI Image Caption Generator", layout="centered")
+perf.start_page("ai-caption")
 
-# Load the model and processor
-@st.cache_resource
-def load_model():
-    processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-    model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-    return processor, model
-
-processor, model = load_model()
+# Captions shared by every session; CAPTION_CACHE_DB="" keeps it memory-only
+@perf.cache_resource
+def get_caption_cache():
+    path = os.environ.get("CAPTION_CACHE_DB", os.path.join(".cache", "captions.sqlite"))
+    return CaptionCache(max_items=2048, path=path or None, max_disk_items=100_000)
 
 st.title("🖼️ AI Image Caption Generator")
 st.write("Upload an image and get a caption generated by AI!")
 st.caption("This program is open source Develop by ismerio")
 st.caption("Using transformers")
-uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
 
-if uploaded_file is not None:
-    image = Image.open(uploaded_file).convert("RGB")
-    st.image(image, caption="Uploaded Image", use_container_width=True)
+with st.expander("Inference settings"):
+    backend = st.selectbox("Backend", BACKENDS, index=BACKENDS.index(os.environ.get("CAPTION_BACKEND", "fp32")))
+    compile_model = st.checkbox("torch.compile", value=False, help="Slow first call, faster after")
+    threads = st.slider("Intra-op threads", 1, DEFAULT_THREADS, DEFAULT_THREADS) if DEFAULT_THREADS > 1 else 1
+
+with st.spinner("Loading model..."):
+    processor, model = load_model(backend, compile_model)
+    worker = get_inference_worker(backend, compile_model, threads)
+tag = model_tag(backend, compile_model)
+cache = get_caption_cache()
+
+mode = st.radio("Mode", ["Single image", "Multiple images"], horizontal=True)
+
+if mode == "Single image":
+    uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
+
+    if uploaded_file is not None:
+        image = load_image(uploaded_file)
+        st.image(uploaded_file.getvalue(), caption="Uploaded Image", use_container_width=True)
 
-    with st.spinner("Generating caption..."):
-        inputs = processor(images=image, return_tensors="pt")
-        out = model.generate(**inputs, max_new_tokens=50)
-        caption = processor.decode(out[0], skip_special_tokens=True)
+        key = image_key(image, tag, max_new_tokens=50)
+        caption = cache.get(key)
+        if caption is None:
+            # Show tokens as they are generated instead of after the last one
+            shown = st.empty()
+            caption = ""
+            try:
+                with st.spinner("Generating caption..."):
+                    for text in caption_stream(processor, model, image, worker=worker):
+                        caption += text
+                        shown.success(f"📝 Caption: **{caption.strip()}**")
+                caption = caption.strip()
+                cache.put(key, caption)
+                shown.success(f"📝 Caption: **{caption}**")
+            except Overloaded:
+                shown.error("The caption server is busy, please try again in a moment.")
+        else:
+            st.success(f"📝 Caption: **{caption}**")
 
-    st.success(f"📝 Caption: **{caption}**")
+else:
+    uploaded_files = st.file_uploader("Choose images...", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+    batch_size = st.slider("Batch size", 1, 32, 8, help="Images per generate call on the shared model")
+
+    if uploaded_files and st.button("Generate captions"):
+        rows = []
+        progress = st.progress(0.0, text="Generating captions...")
+        table = st.empty()
+        start = time.perf_counter()
+
+        # The shared worker batches these with other sessions' requests;
+        # rows appear as each micro-batch finishes
+        try:
+            for batch in batched(uploaded_files, batch_size):
+                images = [load_image(f) for f in batch]
+                captions = caption_images_cached(processor, model, images, cache, tag=tag, worker=worker, max_batch=batch_size)
+                rows += [{"file": f.name, "caption": c} for f, c in zip(batch, captions)]
+                table.dataframe(rows, use_container_width=True)
+                progress.progress(len(rows) / len(uploaded_files), text=f"{len(rows)}/{len(uploaded_files)} captioned")
+        except Overloaded:
+            st.error("The caption server is busy, please try again in a moment.")
+        else:
+            elapsed = time.perf_counter() - start
+            st.success(f"📝 Captioned {len(rows)} images in {elapsed:.1f}s ({len(rows) / elapsed:.2f} images/s)")
+
+    # Latency and caption agreement with fp32 for every backend on these uploads
+    if uploaded_files and st.button("Compare inference modes"):
+        with st.spinner("Running every backend..."):
+            images = [load_image(f) for f in uploaded_files[:8]]
+            # Separate throwaway models: the shared one belongs to the worker
+            report = backend_report(images, BACKENDS, compile_model, threads)
+        st.dataframe(report, use_container_width=True)
+
+stats = cache.stats
+st.caption(
+    f"Caption cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+    f"{stats['misses']} misses ({cache.hit_rate():.0%} hit rate)"
+)
+metrics = worker.metrics()
+st.caption(
+    f"Inference queue: {metrics['queue_depth']} waiting, mean batch {metrics['mean_batch_size']:.1f}, "
+    f"p50 {metrics['p50_latency_s']:.2f}s / p95 {metrics['p95_latency_s']:.2f}s, {metrics['rejected']} rejected"
+)
 
 st.write("---")
 st.page_link("main.py",label="[⬅️ Back]")
+
+perf.finish_page()
@@ -1,45 +1,108 @@
-import streamlit as st
-
-st.title("BMI Calculator")
-imgshow = st.empty()
-bmishow = st.empty()
-categoryshow = st.empty()
-
-bmi_categories = {
-    18.5: "Underweight",
-    24.9: "Healthy weight",
-    29.9: "Overweight",
-    float('inf'): "Obese"
-}
-
-Gender = st.radio("Select Gender:", options=["Male", "Female"], horizontal=True)
-kg = st.slider("Weight (Kg)", 0, 500)
-height = st.slider("Height (Cm)", 0, 500)
-
-if kg > 0 and height > 0:
-    imgnum = 0
-    bmi = kg / ((height / 100) ** 2)
-    bmi_str = f"{bmi:.2f}"
-
-    for threshold, category in bmi_categories.items():
-        imgnum += 1
-        if bmi <= threshold:
-            result = category
-            break
-
-    bmishow.write(f"BMI: {bmi_str}")
-    categoryshow.write(f"Category: **{result}**")
-
-    image_path = f"img/{Gender.lower()}{imgnum}.png"
-    imgshow.image(image_path, width=250)
-
-else:
-    if kg == 0 and height > 0:
-        st.header("Please enter valid weight.")
-    elif kg > 0 and height == 0:
-        st.header("Please enter valid height.")
-    else:
-        st.header("Please enter valid weight and height.")
-
-st.markdown("---")
-st.page_link("main.py",label="[⬅️ Back]")
+import functools
+import os
+import streamlit as st
+import perf
+from bmi_bulk import bmi_categories, is_parquet, pq, read_columns, score_file
+
+perf.start_page("bmi")
+
+st.title("BMI Calculator")
+mode = st.radio("Mode:", options=["Single", "Bulk upload"], horizontal=True)
+imgshow = st.empty()
+bmishow = st.empty()
+categoryshow = st.empty()
+
+
+def guess_column(columns, word):
+    # Preselect the first column whose name mentions `word`
+    for i, column in enumerate(columns):
+        if word in str(column).lower():
+            return i
+    return 0
+
+def read_result(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+if mode == "Single":
+    Gender = st.radio("Select Gender:", options=["Male", "Female"], horizontal=True)
+    kg = st.slider("Weight (Kg)", 0, 500)
+    height = st.slider("Height (Cm)", 0, 500)
+
+    if kg > 0 and height > 0:
+        imgnum = 0
+        bmi = kg / ((height / 100) ** 2)
+        bmi_str = f"{bmi:.2f}"
+
+        for threshold, category in bmi_categories.items():
+            imgnum += 1
+            if bmi <= threshold:
+                result = category
+                break
+
+        bmishow.write(f"BMI: {bmi_str}")
+        categoryshow.write(f"Category: **{result}**")
+
+        image_path = f"img/{Gender.lower()}{imgnum}.png"
+        imgshow.image(image_path, width=250)
+
+    else:
+        if kg == 0 and height > 0:
+            st.header("Please enter valid weight.")
+        elif kg > 0 and height == 0:
+            st.header("Please enter valid height.")
+        else:
+            st.header("Please enter valid weight and height.")
+
+else:
+    # Whole datasets: read in chunks, scored with NumPy, results written to disk
+    upload = st.file_uploader("CSV or Parquet file with weight (Kg) and height (Cm) columns", type=["csv", "parquet"])
+    if upload is not None and is_parquet(upload.name) and pq is None:
+        st.error("Reading Parquet files needs pyarrow.")
+    elif upload is not None:
+        columns = read_columns(upload, upload.name)
+        weight_column = st.selectbox("Weight column (Kg)", columns, index=guess_column(columns, "weight"))
+        height_column = st.selectbox("Height column (Cm)", columns, index=guess_column(columns, "height"))
+        formats = ["None", "CSV", "Parquet"] if pq is not None else ["None", "CSV"]
+        result_format = st.radio("Result file:", options=formats, index=1, horizontal=True)
+
+        if st.button("Calculate BMI"):
+            previous = st.session_state.get("bmi_bulk")
+            if previous is not None and previous[1].path and os.path.exists(previous[1].path):
+                os.remove(previous[1].path)
+            progress = st.empty()
+            with perf.span("bmi bulk"):
+                result = score_file(
+                    upload, upload.name, weight_column, height_column,
+                    None if result_format == "None" else result_format.lower(),
+                    progress=lambda rows: progress.caption(f"{rows:,} rows scored..."),
+                )
+            progress.empty()
+            st.session_state.bmi_bulk = ((upload.name, upload.size), result)
+
+        stored = st.session_state.get("bmi_bulk")
+        if stored is not None and stored[0] == (upload.name, upload.size):
+            result = stored[1]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Rows", f"{result.rows:,}")
+            col2.metric("Mean BMI", f"{result.mean_bmi():.2f}")
+            col3.metric("Rows/s", f"{result.rows / max(result.seconds, 1e-9):,.0f}")
+
+            st.subheader("Categories")
+            st.bar_chart(result.category_frame(), x="category", y="rows")
+            st.subheader("BMI distribution")
+            st.bar_chart(result.histogram_frame(), x="bmi", y="rows")
+
+            if result.path and os.path.exists(result.path):
+                # Read only when clicked, not on every rerun, and without rerunning the page
+                st.download_button(
+                    "📥 Download results", functools.partial(read_result, result.path),
+                    file_name=os.path.splitext(upload.name)[0] + "_bmi" + os.path.splitext(result.path)[1],
+                    on_click="ignore",
+                )
+
+st.markdown("---")
+st.page_link("main.py",label="[⬅️ Back]")
+
+perf.finish_page()
@@ -1,157 +1,250 @@
-# main.py
-import streamlit as st
-import requests
-
-st.set_page_config(page_title="Command Prompt GUI", layout="wide")
-
-# Styling
-st.markdown("""
-    <style>
-    .terminal {
-        background-color: black;
-        color: #00FF00;
-        font-family: monospace;
-        padding: 10px;
-        border-radius: 10px;
-        height: 400px;
-        overflow-y: auto;
-        white-space: pre-wrap;
-    }
-    .directory-info {
-        background-color: #222;
-        color: #00FF00;
-        font-family: monospace;
-        padding: 5px 10px;
-        border-radius: 10px;
-        margin-bottom: 10px;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-st.title("🖥️ Command Prompt GUI")
-
-# Session State
-if "connected" not in st.session_state:
-    st.session_state.connected = False
-if "terminal_history" not in st.session_state:
-    st.session_state.terminal_history = ""
-if "current_directory" not in st.session_state:
-    st.session_state.current_directory = "Unknown"
-
-# Inputs
-ip_address = st.text_input("Enter ngrok Server IP (e.g., http://abc123.ngrok.io) ngrok command to open (ngrok http 8000)")
-
-# Buttons
-col1, col2 = st.columns(2)
-
-with col1:
-    if st.button("Connect"):
-        if ip_address:
-            try:
-                # Try ping server first
-                response = requests.post(f"{ip_address}/connect", json={"command": "connect"}, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    st.session_state.connected = True
-                    st.session_state.current_directory = data.get("current_directory", "Unknown")
-                    st.session_state.terminal_history += "Connected to server.\n"
-                    st.success("Connected!")
-
-                else:
-                    # If server answers weird, show error
-                    st.error("Could not connect to server. Is your rec.py running?")
-                    st.session_state.connected = False
-                    # Scroll down hint
-                    st.markdown('<a href="#download-rec" style="color:red;font-weight:bold;">⬇️ Scroll down to Download Receive.py</a>', unsafe_allow_html=True)
-
-            except Exception as e:
-                # If cannot reach server at all
-                st.error(f"Connection failed: {e}")
-                st.session_state.connected = False
-                # Scroll down hint
-                st.markdown('<a href="#download-rec" style="color:red;font-weight:bold;">⬇️ Scroll down to Download Receive.py</a>', unsafe_allow_html=True)
-
-        else:
-            st.warning("Please enter the server IP.")
-
-
-with col2:
-    if st.button("Disconnect"):
-        if ip_address:
-            try:
-                response = requests.post(f"{ip_address}/connect", json={"command": "disconnect"})
-                st.session_state.connected = False
-                st.success("Disconnected!")
-                st.session_state.terminal_history += "Disconnected from server.\n"
-            except Exception as e:
-                st.error(f"Disconnection error: {e}")
-        else:
-            st.warning("Please enter the server IP.")
-
-# Show Current Directory from Server
-st.markdown(f'<div class="directory-info">Current Directory: {st.session_state.current_directory}</div>', unsafe_allow_html=True)
-
-# Terminal output
-st.markdown(f'<div class="terminal">{st.session_state.terminal_history}</div>', unsafe_allow_html=True)
-
-
-# Command Input
-if st.session_state.connected:
-    command = st.text_input("Enter your command")
-
-    if st.button("Execute Command"):
-        if command:
-            try:
-                # Before sending command, check if server is alive
-                ping_check = requests.post(f"{ip_address}/connect", json={"command": "connect"}, timeout=5)
-
-                if ping_check.status_code == 200:
-                    # If server responds OK, continue normal
-                    cmd = command.strip()
-
-                    response = requests.post(f"{ip_address}/command", json={"command": cmd}, timeout=10)
-                    data = response.json()
-
-                    output = data.get("output", "No output")
-                    new_dir = data.get("current_directory", st.session_state.current_directory)
-
-                    # Update server directory
-                    st.session_state.current_directory = new_dir
-
-                    # Handle "call" command differently
-                    if cmd.lower() == "call":
-                        # Parse output lines
-                        st.session_state.terminal_history += f"> {command}\n"
-                        items = output.split("\n")
-                        for item in items:
-                            st.session_state.terminal_history += f"{item}\n"
-                        st.rerun()
-
-                    else:
-                        # Normal commands
-                        st.session_state.terminal_history += f"> {command}\n{output}\n"
-                        st.rerun()
-
-                else:
-                    st.session_state.connected = False
-                    st.error("Server not responding. Disconnected!")
-                    st.session_state.terminal_history += "Server not responding. Disconnected.\n"
-                    st.rerun()
-
-            except Exception as e:
-                # If any error (timeout, disconnect, etc)
-                st.session_state.connected = False
-                st.error(f"Disconnected: {e}")
-                st.session_state.terminal_history += f"Disconnected: {e}\n"
-                st.rerun()
-else:
-    st.warning("Please connect to a server first.")
-
-
-# Footer
-st.markdown("---")
-st.markdown('<h3 id="download-rec">Download Receive.py</h3>', unsafe_allow_html=True)
-st.link_button("📥 Download Receive.py", "https://github.com/IsMeRio/ismerio-command-prompts-streamlit/blob/main/rec.py")
-st.page_link("main.py",label="[⬅️ Back]")
-st.caption("Version 0.25 (Alpha) | Report bugs to ismerio on Discord")
-
+# main.py
+import html
+import streamlit as st
+import time
+import perf
+from http_client import shared_client
+from remote_shell import NotSupported, StreamJob, execute, execute_batch, format_result, ping
+from terminal_history import TerminalHistory
+
+st.set_page_config(page_title="Command Prompt GUI", layout="wide")
+perf.start_page("command-prompts")
+
+# Styling
+st.markdown("""
+    <style>
+    .terminal {
+        background-color: black;
+        color: #00FF00;
+        font-family: monospace;
+        padding: 10px;
+        border-radius: 10px;
+        height: 400px;
+        overflow-y: auto;
+        white-space: pre-wrap;
+    }
+    .directory-info {
+        background-color: #222;
+        color: #00FF00;
+        font-family: monospace;
+        padding: 5px 10px;
+        border-radius: 10px;
+        margin-bottom: 10px;
+    }
+    </style>
+""", unsafe_allow_html=True)
+
+st.title("🖥️ Command Prompt GUI")
+
+# Pooled keep-alive connection per server, shared with the other pages
+http = shared_client()
+
+# Session State
+if "connected" not in st.session_state:
+    st.session_state.connected = False
+if "terminal_history" not in st.session_state:
+    st.session_state.terminal_history = TerminalHistory()
+if "scroll_back" not in st.session_state:
+    st.session_state.scroll_back = 0
+if "current_directory" not in st.session_state:
+    st.session_state.current_directory = "Unknown"
+if "last_contact" not in st.session_state:
+    st.session_state.last_contact = 0.0
+if "stream_job" not in st.session_state:
+    st.session_state.stream_job = None
+if "no_stream" not in st.session_state:
+    st.session_state.no_stream = set()  # Server URLs without /stream (rec.py)
+
+history = st.session_state.terminal_history
+
+# Only the newest lines stay in memory, older ones are kept on disk
+VIEW_LINES = 200
+with st.sidebar:
+    history.resize(st.number_input("History lines kept in memory", 500, 100000, 2000, step=500))
+
+# Inputs
+ip_address = st.text_input("Enter ngrok Server IP (e.g., http://abc123.ngrok.io) ngrok command to open (ngrok http 8000)")
+
+# Buttons
+col1, col2 = st.columns(2)
+
+with col1:
+    if st.button("Connect"):
+        if ip_address:
+            try:
+                # Try ping server first
+                response = http.post(f"{ip_address}/connect", json={"command": "connect"}, timeout=(5, 5))
+                if response.status_code == 200:
+                    data = response.json()
+                    st.session_state.connected = True
+                    st.session_state.last_contact = time.monotonic()
+                    st.session_state.current_directory = data.get("current_directory", "Unknown")
+                    history.write("Connected to server.\n")
+                    st.success("Connected!")
+
+                else:
+                    # If server answers weird, show error
+                    st.error("Could not connect to server. Is your rec.py running?")
+                    st.session_state.connected = False
+                    # Scroll down hint
+                    st.markdown('<a href="#download-rec" style="color:red;font-weight:bold;">⬇️ Scroll down to Download Receive.py</a>', unsafe_allow_html=True)
+
+            except Exception as e:
+                # If cannot reach server at all
+                st.error(f"Connection failed: {e}")
+                st.session_state.connected = False
+                # Scroll down hint
+                st.markdown('<a href="#download-rec" style="color:red;font-weight:bold;">⬇️ Scroll down to Download Receive.py</a>', unsafe_allow_html=True)
+
+        else:
+            st.warning("Please enter the server IP.")
+
+
+with col2:
+    if st.button("Disconnect"):
+        if ip_address:
+            try:
+                response = http.post(f"{ip_address}/connect", json={"command": "disconnect"}, timeout=(5, 5))
+                st.session_state.connected = False
+                st.success("Disconnected!")
+                history.write("Disconnected from server.\n")
+            except Exception as e:
+                st.error(f"Disconnection error: {e}")
+        else:
+            st.warning("Please enter the server IP.")
+
+# Show Current Directory from Server
+st.markdown(f'<div class="directory-info">Current Directory: {st.session_state.current_directory}</div>', unsafe_allow_html=True)
+
+def run_buffered(commands):
+    try:
+        if len(commands) == 1:
+            results = [execute(http, ip_address, commands[0])]
+        else:
+            results = execute_batch(http, ip_address, commands)
+        st.session_state.last_contact = time.monotonic()
+
+        for result in results:
+            # Update server directory
+            if result["current_directory"]:
+                st.session_state.current_directory = result["current_directory"]
+            history.write(format_result(result))
+
+    except Exception as e:
+        # If any error (timeout, disconnect, etc)
+        st.session_state.connected = False
+        st.error(f"Disconnected: {e}")
+        history.write(f"Disconnected: {e}\n")
+
+def collect_stream(job):
+    # Moves what the background reader got so far into the history; True
+    # once the command has finished
+    for kind, payload in job.drain():
+        if kind == "start":
+            history.write(f"> {job.command}")
+        elif kind == "line":
+            history.write(payload)
+        elif kind == "done":
+            if job.cancelled:
+                history.write("^C\n")
+            if payload.get("current_directory"):
+                st.session_state.current_directory = payload["current_directory"]
+            st.session_state.last_contact = time.monotonic()
+        elif kind == "error" and isinstance(payload, NotSupported):
+            # rec.py has no /stream: remember it and use /command from now on
+            st.session_state.no_stream.add(job.base)
+            run_buffered([job.command])
+        elif kind == "error":
+            st.session_state.connected = False
+            history.write(f"Disconnected: {payload}\n")
+    return job.done()
+
+# Terminal output: only a window of VIEW_LINES lines is sent to the browser.
+# While a streamed command runs, this fragment alone reruns to pick up its
+# output; the script itself never waits on the stream, so Cancel stays live.
+@st.fragment(run_every=0.25 if st.session_state.stream_job is not None else None)
+def terminal_view():
+    job = st.session_state.stream_job
+    if job is not None and collect_stream(job):
+        st.session_state.stream_job = None
+        st.rerun()  # Whole page: directory, buttons
+    text = html.escape("\n".join(history.tail(VIEW_LINES, st.session_state.scroll_back)))
+    st.markdown(f'<div class="terminal">{text}</div>', unsafe_allow_html=True)
+
+scroll_older, scroll_newer, scroll_latest, scroll_info = st.columns([1, 1, 1, 3])
+if scroll_older.button("⬆️ Older", disabled=st.session_state.scroll_back + VIEW_LINES >= len(history)):
+    st.session_state.scroll_back = min(st.session_state.scroll_back + VIEW_LINES, max(len(history) - VIEW_LINES, 0))
+if scroll_newer.button("⬇️ Newer", disabled=st.session_state.scroll_back == 0):
+    st.session_state.scroll_back = max(st.session_state.scroll_back - VIEW_LINES, 0)
+if scroll_latest.button("Latest", disabled=st.session_state.scroll_back == 0):
+    st.session_state.scroll_back = 0
+if st.session_state.scroll_back:
+    scroll_info.caption(f"Showing {st.session_state.scroll_back} lines back of {len(history)}")
+
+terminal_view()
+
+
+# Background heartbeat instead of a ping before every command; skipped
+# while commands themselves keep proving the server is alive
+HEARTBEAT_SECONDS = 20
+
+@st.fragment(run_every=HEARTBEAT_SECONDS)
+def heartbeat():
+    if not st.session_state.connected or not ip_address:
+        return
+    if time.monotonic() - st.session_state.last_contact < HEARTBEAT_SECONDS:
+        return
+    if ping(http, ip_address):
+        st.session_state.last_contact = time.monotonic()
+    else:
+        st.session_state.connected = False
+        history.write("Server not responding. Disconnected.\n")
+        st.rerun()
+
+
+# Command Input
+if st.session_state.connected:
+    batch_mode = st.toggle("Batch script", help="Several commands, one per line, sent in a single request")
+    if batch_mode:
+        script = st.text_area("Enter your commands (one per line)")
+        commands = [line.strip() for line in script.splitlines() if line.strip()]
+    else:
+        command = st.text_input("Enter your command")
+        commands = [command.strip()] if command.strip() else []
+    stream_mode = not batch_mode and st.toggle("Stream output", value=True, help="Show output while the command runs")
+
+    job = st.session_state.stream_job
+    col_run, col_cancel = st.columns(2)
+    run_clicked = col_run.button("Execute Command", disabled=job is not None)
+    if col_cancel.button("Cancel running command", disabled=job is None):
+        job.cancel()
+
+    if run_clicked and commands:
+        # New output jumps the view back to the newest lines
+        st.session_state.scroll_back = 0
+        if stream_mode and ip_address not in st.session_state.no_stream:
+            st.session_state.stream_job = StreamJob(http, ip_address, commands[0])
+        else:
+            run_buffered(commands)
+        st.rerun()
+
+    heartbeat()
+else:
+    st.warning("Please connect to a server first.")
+
+
+with st.expander("Connection stats"):
+    st.dataframe(
+        [{"endpoint": endpoint, **stats} for endpoint, stats in http.metrics().items()],
+        use_container_width=True,
+    )
+
+# Footer
+st.markdown("---")
+st.markdown('<h3 id="download-rec">Download Receive.py</h3>', unsafe_allow_html=True)
+st.link_button("📥 Download Receive.py", "https://github.com/IsMeRio/ismerio-command-prompts-streamlit/blob/main/rec.py")
+st.page_link("main.py",label="[⬅️ Back]")
+st.caption("Version 0.25 (Alpha) | Report bugs to ismerio on Discord")
+
+perf.finish_page()
+
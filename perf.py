@@ -0,0 +1,223 @@
+from collections import deque
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+# Process-wide performance counters for the pages: per-page rerun times,
+# named spans around hot sections (model load, generate, fetch_covid,
+# minimax, http, ...) and hit rates of the st.cache_* functions.
+# Streamlit is only imported inside the page helpers, so the engine, model
+# and HTTP modules can record spans without it.
+#
+# Each page calls start_page(name) first and finish_page() last. Runs cut
+# short by st.rerun()/st.switch_page() are timed up to the next start_page()
+# and counted as interrupted; runs that ended in an exception or st.stop()
+# are dropped. PERF_DEBUG=1 or ?debug=1 shows the debug panel.
+
+WINDOW = 512  # Samples kept per timing for the percentiles
+MAX_RUN_SPANS = 256  # Spans kept per rerun for the breakdown
+
+
+def percentile(values, pct):
+    # Linearly interpolated percentile, 0.0 for no values; the one used by
+    # every p50/p95 in the app and the benchmarks
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=WINDOW)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": percentile(self.samples, 50) * 1000,
+            "p95_ms": percentile(self.samples, 95) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.reruns = {}
+            self.interrupted = {}
+            self.last_runs = {}
+            self.spans = {}
+            self.caches = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            timing = self.spans.get(name)
+            if timing is None:
+                timing = self.spans[name] = Timing()
+            timing.add(seconds)
+        # Spans on the script thread also go into the current rerun's breakdown
+        run = getattr(self.local, "run", None)
+        if run is not None and len(run["spans"]) < MAX_RUN_SPANS:
+            run["spans"].append((name, seconds))
+
+    def add_rerun(self, run, seconds, interrupted=False):
+        page = run["page"]
+        with self.lock:
+            timings = self.interrupted if interrupted else self.reruns
+            if page not in timings:
+                timings[page] = Timing()
+            timings[page].add(seconds)
+            self.last_runs[page] = {
+                "total_ms": seconds * 1000,
+                "interrupted": interrupted,
+                "spans": [{"name": name, "ms": s * 1000} for name, s in run["spans"]],
+            }
+
+    def cache_event(self, name, miss):
+        with self.lock:
+            stats = self.caches.get(name)
+            if stats is None:
+                stats = self.caches[name] = {"calls": 0, "misses": 0}
+            stats["calls" if not miss else "misses"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            caches = {}
+            for name, stats in self.caches.items():
+                hits = max(stats["calls"] - stats["misses"], 0)
+                caches[name] = {
+                    "calls": stats["calls"],
+                    "hits": hits,
+                    "misses": stats["misses"],
+                    "hit_rate": hits / stats["calls"] if stats["calls"] else 0.0,
+                }
+            return {
+                "reruns": {page: t.summary() for page, t in self.reruns.items()},
+                "interrupted": {page: t.summary() for page, t in self.interrupted.items()},
+                "last_runs": dict(self.last_runs),
+                "spans": {name: t.summary() for name, t in self.spans.items()},
+                "caches": caches,
+            }
+
+
+recorder = Recorder()
+span = recorder.span
+
+
+# --- Cache Hit Rates ---
+def cached(kind, func=None, **kwargs):
+    # Drop-in for st.cache_data / st.cache_resource that counts calls and
+    # misses: the inner function only runs on a miss
+    import streamlit as st
+    decorator = getattr(st, kind)
+
+    def wrap(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def on_miss(*args, **kw):
+            recorder.cache_event(name, miss=True)
+            return func(*args, **kw)
+
+        cached_func = decorator(**kwargs)(on_miss) if kwargs else decorator(on_miss)
+
+        @functools.wraps(func)
+        def call(*args, **kw):
+            recorder.cache_event(name, miss=False)
+            return cached_func(*args, **kw)
+
+        call.clear = cached_func.clear
+        return call
+
+    return wrap(func) if func is not None else wrap
+
+def cache_data(func=None, **kwargs):
+    return cached("cache_data", func, **kwargs)
+
+def cache_resource(func=None, **kwargs):
+    return cached("cache_resource", func, **kwargs)
+
+
+# --- Page Reruns ---
+def start_page(name):
+    import streamlit as st
+    now = time.perf_counter()
+    previous = st.session_state.get("_perf_run")
+    # st.rerun() starts the next run on the same script thread straight away.
+    # Otherwise the last run ended (exception, st.stop()) and the time since
+    # then is idle, not part of any rerun.
+    if previous is not None and getattr(recorder.local, "run", None) is previous:
+        recorder.add_rerun(previous, now - previous["start"], interrupted=True)
+    run = {"page": name, "start": now, "spans": []}
+    st.session_state["_perf_run"] = run
+    recorder.local.run = run
+
+def finish_page():
+    import streamlit as st
+    run = st.session_state.get("_perf_run")
+    if run is not None:
+        recorder.add_rerun(run, time.perf_counter() - run["start"])
+        st.session_state["_perf_run"] = None
+    recorder.local.run = None
+    if debug_enabled():
+        debug_panel(run["page"] if run else None)
+
+def debug_enabled():
+    import streamlit as st
+    return os.environ.get("PERF_DEBUG", "0") == "1" or st.query_params.get("debug") == "1"
+
+def debug_panel(page=None):
+    import streamlit as st
+    snapshot = recorder.snapshot()
+    with st.expander("⏱️ Performance"):
+        if page in snapshot["last_runs"]:
+            last = snapshot["last_runs"][page]
+            st.caption(f"Last {page} rerun: {last['total_ms']:.1f} ms")
+            if last["spans"]:
+                st.dataframe(last["spans"], use_container_width=True)
+        st.markdown("**Reruns per page**")
+        st.dataframe(
+            [{"page": page, **stats} for page, stats in snapshot["reruns"].items()]
+            + [{"page": f"{page} (interrupted)", **stats} for page, stats in snapshot["interrupted"].items()],
+            use_container_width=True,
+        )
+        st.markdown("**Spans**")
+        st.dataframe([{"span": name, **stats} for name, stats in snapshot["spans"].items()], use_container_width=True)
+        st.markdown("**Caches**")
+        st.dataframe([{"function": name, **stats} for name, stats in snapshot["caches"].items()], use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        col1.download_button(
+            "📥 Export JSON", json.dumps(snapshot, indent=2), file_name="perf.json", mime="application/json"
+        )
+        if col2.button("Reset counters"):
+            recorder.reset()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Headless rerun-latency benchmark for every page, driven through
+# Streamlit's AppTest against the local stub servers (covid_stub.py,
+# rec_stub.py), so it runs offline. The caption page needs the BLIP model
+# and only runs with --with-model.
+#
+#   python perf_bench.py --reruns 20 --out perf.json
+#   python perf_bench.py --baseline perf.json   # exit 1 on a p50 regression
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TIMEOUT = 120
+PAGES = ["main", "bmi", "XO", "Covid", "command-prompts", "ai-caption"]
+
+
+def timed_run(at, samples):
+    start = time.perf_counter()
+    at.run(timeout=TIMEOUT)
+    samples.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+# --- Scenarios: one per page, each returns its rerun times ---
+def bench_main(at, reruns):
+    samples = []
+    for _ in range(reruns):
+        timed_run(at, samples)
+    return samples
+
+def bench_bmi(at, reruns):
+    samples = []
+    at.switch_page("pages/bmi.py")
+    timed_run(at, samples)
+    for i in range(reruns):
+        at.slider[0].set_value(50 + i)
+        at.slider[1].set_value(150 + i)
+        timed_run(at, samples)
+    return samples
+
+def bench_xo(at, reruns):
+    samples = []
+    at.switch_page("pages/XO.py")
+    timed_run(at, samples)
+    at.radio(key="board_render").set_value("Buttons")
+    timed_run(at, samples)
+    while len(samples) < reruns:
+        if not at.session_state["game_running"] or at.session_state["winner"]:
+            label = "⏹ Stop" if at.session_state["game_running"] else "▶️ Start"
+            button(at, label).click()
+            timed_run(at, samples)
+            continue
+        # Human move, then rerun until the AI's background move lands
+        idx = at.session_state["board"].index("")
+        at.button(key=f"cell{idx}").click()
+        timed_run(at, samples)
+        while at.session_state["ai_job"] is not None:
+            time.sleep(0.02)
+            timed_run(at, samples)
+    return samples
+
+def bench_covid(at, reruns):
+    samples = []
+    at.switch_page("pages/Covid.py")
+    timed_run(at, samples)  # Cold: fetches from the stub
+    for i in range(reruns):
+        at.checkbox[2].set_value(i % 2 == 0)
+        timed_run(at, samples)
+    at.radio[0].set_value("Time series")
+    for _ in range(max(reruns // 4, 1)):
+        timed_run(at, samples)
+    return samples
+
+def bench_command_prompts(at, reruns, rec_url):
+    samples = []
+    at.switch_page("pages/command-prompts.py")
+    timed_run(at, samples)
+    at.text_input[0].input(rec_url)
+    button(at, "Connect").click()
+    timed_run(at, samples)
+    for i in range(reruns):
+        at.text_input[1].input(f"echo line {i}")
+        button(at, "Execute Command").click()
+        timed_run(at, samples)
+        # Output is read in the background; rerun until it has landed
+        while at.session_state["stream_job"] is not None:
+            time.sleep(0.02)
+            timed_run(at, samples)
+    return samples
+
+def bench_caption(at, reruns):
+    samples = []
+    at.switch_page("pages/ai-caption.py")
+    for _ in range(reruns):
+        timed_run(at, samples)
+    return samples
+
+
+def summary(samples):
+    from perf import percentile
+    return {
+        "reruns": len(samples),
+        "first_ms": samples[0] * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "max_ms": max(samples, default=0.0) * 1000,
+    }
+
+def regressions(report, baseline, tolerance):
+    # Pages whose p50 rerun time grew by more than `tolerance` (a fraction)
+    out = []
+    for page, stats in report["pages"].items():
+        old = baseline.get("pages", {}).get(page)
+        if old and old["p50_ms"] > 0 and stats["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            out.append(f"{page}: p50 {old['p50_ms']:.1f} ms -> {stats['p50_ms']:.1f} ms")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark page rerun latency with Streamlit AppTest")
+    parser.add_argument("--pages", nargs="+", default=[p for p in PAGES if p != "ai-caption"], choices=PAGES)
+    parser.add_argument("--with-model", action="store_true", help="also run the caption page (loads BLIP)")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs the baseline")
+    args = parser.parse_args(argv)
+    pages = args.pages + (["ai-caption"] if args.with_model and "ai-caption" not in args.pages else [])
+
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+    import covid_stub
+    import rec_stub
+
+    # Stub servers and throwaway caches, set before any page imports its modules
+    scratch = tempfile.mkdtemp(prefix="perf_bench_")
+    _, covid_url = covid_stub.serve()
+    _, rec_url = rec_stub.serve()
+    os.environ["COVID_API_URL"] = covid_url
+    os.environ["COVID_SNAPSHOT"] = os.path.join(scratch, "covid_countries.npz")
+    os.environ["COVID_HISTORY_DIR"] = os.path.join(scratch, "covid_history")
+    os.environ["CAPTION_CACHE_DB"] = os.path.join(scratch, "captions.sqlite")
+    os.environ["CAPTION_WARMUP"] = "0"
+
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+    from perf import recorder
+
+    scenarios = {
+        "main": bench_main,
+        "bmi": bench_bmi,
+        "XO": bench_xo,
+        "Covid": bench_covid,
+        "command-prompts": lambda at, reruns: bench_command_prompts(at, reruns, rec_url),
+        "ai-caption": bench_caption,
+    }
+    results = {}
+    for page in pages:
+        # A fresh app (and session) per page
+        at = AppTest.from_file(os.path.join(HERE, "main.py"), default_timeout=TIMEOUT)
+        results[page] = summary(scenarios[page](at, args.reruns))
+
+    report = {
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "machine": platform.machine(),
+        "args": vars(args),
+        "pages": results,
+        "perf": recorder.snapshot(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for line in slower:
+            print(f"Regression: {line}", file=sys.stderr)
+        return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local reference server for pages/command-prompts.py, standing in for rec.py:
+#
+#   python rec_stub.py --port 8000
+#
+# Runs commands with the local shell, so only bind it to localhost.
+# Endpoints: /connect, /command, /batch (see remote_shell.py), plus
+#   POST /stream {"command"} -> text/event-stream: "start" {id}, one "data"
+#                                event per output line, then "done"
+#   POST /cancel {"id"}      -> stops a streaming command
+
+running = {}
+running_lock = threading.Lock()
+KEEPALIVE_SECONDS = 5  # Comment sent on silence, so a gone client is noticed
+
+
+class Shell:
+    def __init__(self):
+        self.cwd = os.getcwd()
+        self.lock = threading.Lock()
+
+    def cd(self, command):
+        # `cd` has to change the server's notion of cwd, not a subshell's
+        target = command[2:].strip() or os.path.expanduser("~")
+        path = os.path.abspath(os.path.join(self.cwd, os.path.expanduser(target)))
+        if not os.path.isdir(path):
+            return f"cd: no such directory: {target}"
+        self.cwd = path
+        return ""
+
+    def run(self, command, timeout=60):
+        if command == "cd" or command.startswith("cd "):
+            return self.cd(command)
+        try:
+            done = subprocess.run(command, shell=True, cwd=self.cwd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return f"Command timed out after {timeout}s"
+        return done.stdout + done.stderr
+
+    def popen(self, command):
+        # Own process group, so kill() reaches the whole pipeline, not just sh
+        return subprocess.Popen(
+            command, shell=True, cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+            start_new_session=os.name == "posix",
+        )
+
+
+def kill(process):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+shell = Shell()
+
+
+class RecHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def reply(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def event(self, data, name=None):
+        self.chunk((f"event: {name}\n" if name else "") + "".join(f"data: {line}\n" for line in data.split("\n")) + "\n")
+
+    def chunk(self, text):
+        raw = text.encode()
+        self.wfile.write(f"{len(raw):X}\r\n".encode() + raw + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = self.body()
+        if self.path == "/connect":
+            self.reply({"status": "ok", "current_directory": shell.cwd})
+        elif self.path == "/command":
+            output = shell.run(request.get("command", ""))
+            self.reply({"output": output, "current_directory": shell.cwd})
+        elif self.path == "/batch":
+            results = []
+            for command in request.get("commands", []):
+                results.append({"command": command, "output": shell.run(command), "current_directory": shell.cwd})
+            self.reply({"results": results})
+        elif self.path == "/stream":
+            self.stream(request.get("command", ""))
+        elif self.path == "/cancel":
+            with running_lock:
+                process = running.get(request.get("id"))
+            if process is not None:
+                kill(process)
+            self.reply({"cancelled": process is not None})
+        else:
+            self.reply({"error": "not found"}, 404)
+
+    def stream(self, command):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        job = uuid.uuid4().hex
+        if command == "cd" or command.startswith("cd "):
+            process = None
+            output = shell.cd(command)
+        else:
+            process = shell.popen(command)
+            with running_lock:
+                running[job] = process
+        try:
+            self.event(json.dumps({"id": job}), "start")
+            if process is None:
+                if output:
+                    self.event(output)
+            else:
+                lines = queue.Queue()
+
+                def pump():
+                    for line in process.stdout:
+                        lines.put(line)
+                    lines.put(None)
+
+                threading.Thread(target=pump, daemon=True).start()
+                while True:
+                    try:
+                        line = lines.get(timeout=KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        self.chunk(": keepalive\n\n")
+                        continue
+                    if line is None:
+                        break
+                    self.event(line.rstrip("\n"))
+                process.wait()
+            code = process.returncode if process else 0
+            self.event(json.dumps({"current_directory": shell.cwd, "exit_code": code}), "done")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away: that is a cancel too
+            if process is not None:
+                kill(process)
+        finally:
+            with running_lock:
+                running.pop(job, None)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0, host="127.0.0.1"):
+    # Start in a daemon thread; returns (server, base_url). port=0 picks a free one.
+    server = ThreadingHTTPServer((host, port), RecHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for rec.py")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), RecHandler)
+    print(f"Serving on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,148 @@
+import json
+import queue
+import threading
+
+# Client side of the rec.py protocol used by pages/command-prompts.py.
+#   POST /connect {"command": "connect" | "disconnect"} -> {"current_directory"}
+#   POST /command {"command": cmd} -> {"output", "current_directory"}
+#   POST /batch   {"commands": [...]} -> {"results": [{"command", "output", "current_directory"}]}
+#   POST /stream  {"command": cmd} -> text/event-stream (see stream())
+#   POST /cancel  {"id": job_id}
+# /batch and /stream are optional: servers without them get plain /command
+# requests instead. rec_stub.py implements all of them locally.
+
+
+class ServerError(Exception):
+    pass
+
+class NotSupported(ServerError):
+    pass
+
+
+def ping(http, base, timeout=(5, 5)):
+    try:
+        return http.post(f"{base}/connect", json={"command": "connect"}, timeout=timeout).status_code == 200
+    except Exception:
+        return False
+
+def execute(http, base, command, timeout=(5, 10)):
+    # The command request doubles as the liveness check: any failure here
+    # means the server is gone
+    response = http.post(f"{base}/command", json={"command": command}, timeout=timeout)
+    if response.status_code != 200:
+        raise ServerError(f"Server answered {response.status_code}")
+    data = response.json()
+    return {
+        "command": command,
+        "output": data.get("output", "No output"),
+        "current_directory": data.get("current_directory"),
+    }
+
+def execute_batch(http, base, commands, timeout=(5, 60)):
+    # Whole script in one round trip when the server supports /batch
+    response = http.post(f"{base}/batch", json={"commands": commands}, timeout=timeout)
+    if response.status_code in (404, 405):
+        return [execute(http, base, command) for command in commands]
+    if response.status_code != 200:
+        raise ServerError(f"Server answered {response.status_code}")
+    return [
+        {
+            "command": result.get("command", command),
+            "output": result.get("output", "No output"),
+            "current_directory": result.get("current_directory"),
+        }
+        for command, result in zip(commands, response.json().get("results", []))
+    ]
+
+def format_result(result):
+    # "call" prints its output line by line; everything else as one block
+    if result["command"].lower() == "call":
+        return f"> {result['command']}\n" + "".join(f"{item}\n" for item in result["output"].split("\n"))
+    return f"> {result['command']}\n{result['output']}\n"
+
+def stream(http, base, command, timeout=(5, 300)):
+    # Server-sent events from POST /stream: yields ("start", {"id"}), then
+    # ("line", text) per output line, then ("done", {"current_directory",
+    # "exit_code"}). Closing the generator closes the connection, which the
+    # server treats as a cancel.
+    response = http.post(f"{base}/stream", json={"command": command}, timeout=timeout, stream=True)
+    try:
+        if response.status_code in (404, 405):
+            raise NotSupported("Server does not stream output")
+        if response.status_code != 200:
+            raise ServerError(f"Server answered {response.status_code}")
+        event, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].removeprefix(" "))
+                continue
+            if data:
+                payload = "\n".join(data)
+                if event in ("start", "done"):
+                    yield event, json.loads(payload)
+                else:
+                    yield "line", payload
+            event, data = None, []
+    finally:
+        response.close()
+
+def cancel(http, base, job_id, timeout=(5, 5)):
+    try:
+        http.post(f"{base}/cancel", json={"id": job_id}, timeout=timeout)
+    except Exception:
+        pass  # The closed stream already stops it on rec_stub-style servers
+
+
+class StreamJob:
+    # Runs stream() on a daemon thread so the page never blocks on a read:
+    # it polls drain() and can cancel() at any time, even while the command
+    # prints nothing. Events are the ones stream() yields, plus ("error", e).
+    def __init__(self, http, base, command):
+        self.http = http
+        self.base = base
+        self.command = command
+        self.id = None
+        self.cancelled = False
+        self.events = queue.Queue()
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="remote-stream", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            for kind, payload in stream(self.http, self.base, self.command):
+                if kind == "start":
+                    with self.lock:
+                        self.id = payload["id"]
+                        cancelled = self.cancelled
+                    if cancelled:
+                        cancel(self.http, self.base, self.id)
+                self.events.put((kind, payload))
+        except Exception as e:
+            self.events.put(("error", e))
+        finally:
+            self.finished.set()
+
+    def cancel(self):
+        # Before the start event arrives, run() sends the cancel itself
+        with self.lock:
+            self.cancelled = True
+            job_id = self.id
+        if job_id is not None:
+            cancel(self.http, self.base, job_id)
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def done(self):
+        # Finished and every event drained
+        return self.finished.is_set() and self.events.empty()
@@ -0,0 +1,97 @@
+from collections import deque
+import os
+import tempfile
+import threading
+import weakref
+
+# Terminal scroll-back for pages/command-prompts.py.
+# The newest `cap` lines live in a ring buffer; lines pushed out of it are
+# appended to a per-session spill file, so memory stays bounded and older
+# output is still there to scroll back to. Every BLOCK-th spilled line's file
+# offset is remembered, so reading old lines only seeks to the nearest block.
+
+SPILL_DIR = os.path.join(".cache", "terminal")
+BLOCK = 256
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TerminalHistory:
+    def __init__(self, cap=2000, spill_dir=SPILL_DIR):
+        self.cap = cap
+        self.lines = deque()
+        self.spill_dir = spill_dir
+        self.spill = None
+        self.spilled = 0
+        self.offsets = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.spilled + len(self.lines)
+
+    def write(self, text):
+        # Appends whole lines; a trailing newline does not add an empty one
+        if text.endswith("\n"):
+            text = text[:-1]
+        with self.lock:
+            self.lines.extend(text.split("\n"))
+            self.evict()
+
+    def resize(self, cap):
+        with self.lock:
+            self.cap = cap
+            self.evict()
+
+    def evict(self):
+        while len(self.lines) > self.cap:
+            if self.spill is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                fd, path = tempfile.mkstemp(suffix=".log", dir=self.spill_dir)
+                self.spill = os.fdopen(fd, "w+b")
+                # The file goes when the session's history is garbage collected
+                weakref.finalize(self, _remove, path)
+                weakref.finalize(self, self.spill.close)
+            if self.spilled % BLOCK == 0:
+                self.spill.seek(0, os.SEEK_END)
+                self.offsets.append(self.spill.tell())
+            self.spill.write(self.lines.popleft().encode("utf-8", "replace") + b"\n")
+            self.spilled += 1
+
+    def read_spilled(self, start, end):
+        self.spill.flush()
+        self.spill.seek(self.offsets[start // BLOCK])
+        out = []
+        for index in range(start - start % BLOCK, end):
+            line = self.spill.readline()
+            if index >= start:
+                out.append(line[:-1].decode("utf-8", "replace"))
+        self.spill.seek(0, os.SEEK_END)
+        return out
+
+    def tail(self, count, back=0):
+        # `count` lines ending `back` lines before the newest one
+        with self.lock:
+            end = max(len(self) - back, 0)
+            start = max(end - count, 0)
+            out = []
+            if start < self.spilled:
+                out = self.read_spilled(start, min(end, self.spilled))
+            first = max(start - self.spilled, 0)
+            last = end - self.spilled
+            if last > first:
+                out.extend(self.lines[i] for i in range(first, last))
+            return out
+
+    def clear(self):
+        with self.lock:
+            self.lines.clear()
+            if self.spill is not None:
+                self.spill.seek(0)
+                self.spill.truncate()
+            self.spilled = 0
+            self.offsets = []
@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+import perf
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+# Background warm-up of the caption model, started from main.py.
+# torch/transformers are only imported inside the worker thread, so importing
+# this module (and rendering the landing page) stays cheap.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get("CAPTION_BACKEND", "fp32")
+DEFAULT_THREADS = os.cpu_count() or 1
+
+
+# Shared model slot: pages/ai-caption.py and the warm-up both load through here
+@perf.cache_resource(show_spinner=False)
+def load_model(backend="fp32", compile_model=False):
+    from captioner import load_captioner
+    with perf.span("model load"):
+        return load_captioner(backend, compile_model)
+
+# One worker thread per model variant and thread count runs the generate
+# calls; the thread count only applies to that worker's thread, so one
+# session's setting never changes another's. Workers with different counts
+# share the variant's weights, which generate only reads.
+@perf.cache_resource(show_spinner=False)
+def get_inference_worker(backend="fp32", compile_model=False, threads=DEFAULT_THREADS):
+    from captioner import InferenceWorker
+    processor, model = load_model(backend, compile_model)
+    return InferenceWorker(processor, model, max_batch=8, max_wait=0.02, max_queue=64, threads=threads)
+
+
+class WarmupStatus:
+    def __init__(self):
+        self.state = "pending"
+        self.timings = {}
+        self.error = None
+
+    def summary(self):
+        if self.state == "done":
+            parts = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.timings.items())
+            return f"Caption model ready ({parts})"
+        if self.state == "failed":
+            return f"Caption model warm-up failed: {self.error}"
+        if self.state == "disabled":
+            return "Caption model warm-up disabled"
+        return "Caption model warming up..."
+
+def warm_up(status, backend=DEFAULT_BACKEND):
+    status.state = "running"
+    start = time.perf_counter()
+    try:
+        step = time.perf_counter()
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+        from PIL import Image
+        from captioner import INPUT_SIZE
+        status.timings["import"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        worker = get_inference_worker(backend, False)
+        status.timings["load"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        worker.caption_many([Image.new("RGB", (INPUT_SIZE, INPUT_SIZE))])
+        status.timings["first generate"] = time.perf_counter() - step
+
+        status.timings["total"] = time.perf_counter() - start
+        status.state = "done"
+        logger.info(status.summary())
+    except Exception as e:
+        status.error = e
+        status.state = "failed"
+        logger.exception("Caption model warm-up failed")
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    # Once per server process; returns immediately with a live status object
+    status = WarmupStatus()
+    if os.environ.get("CAPTION_WARMUP", "1") == "0":
+        status.state = "disabled"
+        return status
+    thread = threading.Thread(target=warm_up, args=(status,), name="caption-warmup", daemon=True)
+    add_script_run_ctx(thread)
+    thread.start()
+    return status
@@ -0,0 +1,182 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from perf import percentile
+from xo_engine import Board, DRAW, GameState, O, TranspositionTable, X, choose_move, minimax
+from xo_table import SolvedTable
+
+# Headless benchmark and self-play for the XO AI, no Streamlit needed.
+# Drives the same code paths as pages/XO.py: choose_move (best_move),
+# GameState.make (apply_move), Board.winner (check_winner) and minimax.
+#
+#   python xo_bench.py --sizes 3 6 9 --difficulties Easy Normal Hard --games 4 --out bench.json
+
+
+def latency_summary(latencies):
+    return {
+        "moves": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def play_game(size, difficulty, engine, opponent, first, rng, tt, table, executor):
+    # O is the AI under test; X is either the same AI or a random mover
+    state = GameState(size)
+    player = first
+    latencies = []
+    nodes = 0
+    search_time = 0.0
+    while state.winner is None:
+        if player == O or opponent == "self":
+            start = time.perf_counter()
+            result = choose_move(state.board, player, difficulty, engine, tt=tt, table=table, executor=executor)
+            elapsed = time.perf_counter() - start
+            move = result.move
+            if player == O:
+                latencies.append(elapsed)
+                nodes += result.nodes
+                search_time += result.elapsed
+        else:
+            move = rng.choice(state.board.moves())
+        state.make(move, player)
+        player = X if player == O else O
+    assert state.winner == state.board.winner()
+    return state.winner, latencies, nodes, search_time
+
+def run_config(size, difficulty, engine, games, opponent, seed, tt, table, executor):
+    rng = random.Random(seed)
+    results = {X: 0, O: 0, DRAW: 0}
+    latencies = []
+    nodes = 0
+    search_time = 0.0
+
+    start = time.perf_counter()
+    for game in range(games):
+        first = X if game % 2 == 0 else O
+        winner, game_latencies, game_nodes, game_search = play_game(
+            size, difficulty, engine, opponent, first, rng, tt, table, executor
+        )
+        results[winner] += 1
+        latencies += game_latencies
+        nodes += game_nodes
+        search_time += game_search
+    wall = time.perf_counter() - start
+
+    # Peak Python allocations of this config, from one extra untimed game
+    # (tracemalloc would skew the latencies above)
+    tracemalloc.start()
+    try:
+        play_game(size, difficulty, engine, opponent, X, random.Random(seed), tt, table, executor)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "size": size,
+        "difficulty": difficulty,
+        "engine": engine,
+        "opponent": opponent,
+        "games": games,
+        "ai_win_rate": results[O] / games,
+        "ai_loss_rate": results[X] / games,
+        "draw_rate": results[DRAW] / games,
+        "nodes": nodes,
+        "nodes_per_sec": nodes / search_time if search_time else 0.0,
+        "latency": latency_summary(latencies),
+        "peak_alloc_kb": peak / 1024,
+        "wall_s": wall,
+    }
+
+def bench_primitives(size, repeat):
+    # Micro-timings of the per-node operations the search leans on
+    rng = random.Random(size)
+    boards = []
+    for _ in range(repeat):
+        state = GameState(size)
+        player = X
+        for _ in range(rng.randrange(size * size // 2)):
+            state.make(rng.choice(state.board.moves()), player)
+            player = O if player == X else X
+            if state.winner:
+                break
+        boards.append(state.board.cells())
+
+    def timed(fn, items=boards):
+        start = time.perf_counter()
+        for cells in items:
+            fn(cells)
+        return (time.perf_counter() - start) / len(items) * 1e6
+
+    def apply_all(cells):
+        state = GameState(size)
+        for i, v in enumerate(cells):
+            if v:
+                state.make(i, v)
+
+    out = {
+        "size": size,
+        "check_winner_us": timed(lambda cells: Board.from_cells(cells).winner()),
+        "apply_move_us": timed(apply_all),
+    }
+    if size == 3:
+        out["minimax_3x3_empty_ms"] = timed(lambda cells: minimax(Board(3), True), boards[:5]) / 1000
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the XO AI with headless self-play")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 6, 9])
+    parser.add_argument("--difficulties", nargs="+", default=["Easy", "Normal", "Hard"])
+    parser.add_argument("--engines", nargs="+", default=["Minimax"], choices=["Minimax", "MCTS"])
+    parser.add_argument("--games", type=int, default=4)
+    parser.add_argument("--opponent", default="random", choices=["random", "self"])
+    parser.add_argument("--workers", type=int, default=0, help="MCTS process pool size (0 = in-process)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        table = SolvedTable.load()
+    except (OSError, ValueError):
+        table = None
+    tt = TranspositionTable(maxsize=200_000)
+    executor = ProcessPoolExecutor(args.workers) if args.workers else None
+
+    try:
+        runs = [
+            run_config(size, difficulty, engine, args.games, args.opponent, args.seed, tt, table, executor)
+            for size in args.sizes
+            for difficulty in args.difficulties
+            for engine in args.engines
+        ]
+    finally:
+        if executor:
+            executor.shutdown()
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": vars(args),
+        "primitives": [bench_primitives(size, 200) for size in args.sizes],
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
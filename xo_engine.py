@@ -0,0 +1,714 @@
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from math import isqrt, log, sqrt
+import os
+import random
+import threading
+import time
+from perf import span
+
+# Bitboard Tic-Tac-Toe engine used by pages/XO.py.
+# Cell idx = row * size + col, bit idx of an int is set when that cell is taken.
+# Importable without Streamlit.
+
+X = "X"
+O = "O"
+DRAW = "Draw"
+
+
+# --- Precomputed Tables (once per board size) ---
+@lru_cache(maxsize=None)
+def win_lines(size):
+    lines = []
+    for i in range(size):
+        lines.append(tuple(i * size + j for j in range(size)))  # Row
+        lines.append(tuple(j * size + i for j in range(size)))  # Column
+    lines.append(tuple(i * size + i for i in range(size)))  # Diagonal TL-BR
+    lines.append(tuple(i * size + (size - 1 - i) for i in range(size)))  # Diagonal TR-BL
+    return tuple(lines)
+
+@lru_cache(maxsize=None)
+def win_masks(size):
+    return tuple(sum(1 << i for i in line) for line in win_lines(size))
+
+@lru_cache(maxsize=None)
+def cell_masks(size):
+    # Win masks passing through each cell, so a move only checks its own lines
+    return tuple(
+        tuple(mask for mask in win_masks(size) if mask >> idx & 1)
+        for idx in range(size * size)
+    )
+
+@lru_cache(maxsize=None)
+def cell_lines(size):
+    # Indices into win_lines(size) of the lines passing through each cell
+    return tuple(
+        tuple(n for n, line in enumerate(win_lines(size)) if idx in line)
+        for idx in range(size * size)
+    )
+
+@lru_cache(maxsize=None)
+def full_mask(size):
+    return (1 << (size * size)) - 1
+
+@lru_cache(maxsize=None)
+def center_order(size):
+    # Cells sorted center-first, used as the base move ordering
+    c = (size - 1) / 2
+    return tuple(sorted(range(size * size), key=lambda i: abs(i // size - c) + abs(i % size - c)))
+
+@lru_cache(maxsize=None)
+def line_weights(size):
+    # Value of an open line holding k stones of one side; the last one is a
+    # threat (one move from winning) and dominates everything shorter
+    return tuple(0 if k == 0 else 4 ** k for k in range(size + 1))
+
+@lru_cache(maxsize=None)
+def symmetries(size):
+    # The 8 rotations/reflections of the square, as cell permutations
+    n = size - 1
+    maps = (
+        lambda r, c: (r, c),
+        lambda r, c: (c, n - r),
+        lambda r, c: (n - r, n - c),
+        lambda r, c: (n - c, r),
+        lambda r, c: (r, n - c),
+        lambda r, c: (n - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (n - c, n - r),
+    )
+    perms = []
+    for f in maps:
+        perm = [0] * (size * size)
+        for r in range(size):
+            for c in range(size):
+                tr, tc = f(r, c)
+                perm[r * size + c] = tr * size + tc
+        perms.append(tuple(perm))
+    return tuple(perms)
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def permute(mask, perm):
+    out = 0
+    for i in iter_bits(mask):
+        out |= 1 << perm[i]
+    return out
+
+def size_of(cells):
+    size = isqrt(len(cells))
+    if size * size != len(cells):
+        raise ValueError(f"Board of {len(cells)} cells is not square")
+    return size
+
+
+# --- Board ---
+class Board:
+    __slots__ = ("size", "x", "o")
+
+    def __init__(self, size=3, x=0, o=0):
+        self.size = size
+        self.x = x
+        self.o = o
+
+    @classmethod
+    def from_cells(cls, cells, size=None):
+        board = cls(size or size_of(cells))
+        for i, v in enumerate(cells):
+            if v == X:
+                board.x |= 1 << i
+            elif v == O:
+                board.o |= 1 << i
+        return board
+
+    def cells(self):
+        return [
+            X if self.x >> i & 1 else O if self.o >> i & 1 else ""
+            for i in range(self.size * self.size)
+        ]
+
+    def copy(self):
+        return Board(self.size, self.x, self.o)
+
+    def empty(self):
+        return full_mask(self.size) & ~(self.x | self.o)
+
+    def moves(self):
+        return list(iter_bits(self.empty()))
+
+    def play(self, idx, player):
+        if player == X:
+            self.x |= 1 << idx
+        else:
+            self.o |= 1 << idx
+
+    def undo(self, idx):
+        clear = ~(1 << idx)
+        self.x &= clear
+        self.o &= clear
+
+    def wins_at(self, idx, player):
+        bits = self.x if player == X else self.o
+        return any(bits & mask == mask for mask in cell_masks(self.size)[idx])
+
+    def winner(self):
+        for mask in win_masks(self.size):
+            if self.x & mask == mask:
+                return X
+            if self.o & mask == mask:
+                return O
+        if not self.empty():
+            return DRAW
+        return None
+
+    def canonical(self):
+        # Same key for all 8 symmetric variants of the position
+        return min(
+            (permute(self.x, perm), permute(self.o, perm))
+            for perm in symmetries(self.size)
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and (self.size, self.x, self.o) == (other.size, other.x, other.o)
+
+    def __hash__(self):
+        return hash((self.size, self.x, self.o))
+
+    def __repr__(self):
+        return f"Board(size={self.size}, x={self.x:#x}, o={self.o:#x})"
+
+
+# --- Incremental Game State ---
+class GameState:
+    # Board plus per-line stone counters and a running empty-cell count, so
+    # make/unmake only touch the row, column and diagonal(s) through a cell.
+    __slots__ = ("board", "counts", "empty_count", "winner", "moves")
+
+    def __init__(self, size=3):
+        lines = len(win_lines(size))
+        self.board = Board(size)
+        self.counts = {X: [0] * lines, O: [0] * lines}
+        self.empty_count = size * size
+        self.winner = None
+        self.moves = []
+
+    @classmethod
+    def from_cells(cls, cells, size=None):
+        state = cls(size or size_of(cells))
+        for i, v in enumerate(cells):
+            if v in (X, O):
+                state.make(i, v)
+        return state
+
+    def make(self, idx, player):
+        board = self.board
+        board.play(idx, player)
+        counts = self.counts[player]
+        for line in cell_lines(board.size)[idx]:
+            counts[line] += 1
+            if counts[line] == board.size and self.winner is None:
+                self.winner = player
+        self.empty_count -= 1
+        if self.winner is None and not self.empty_count:
+            self.winner = DRAW
+        self.moves.append((idx, player, self.winner))
+        return self.winner
+
+    def unmake(self):
+        idx, player, winner = self.moves.pop()
+        board = self.board
+        board.undo(idx)
+        counts = self.counts[player]
+        for line in cell_lines(board.size)[idx]:
+            counts[line] -= 1
+        self.empty_count += 1
+        self.winner = self.moves[-1][2] if self.moves else None
+        return idx
+
+
+# --- Transposition Table ---
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+class TranspositionTable:
+    # Canonical position -> (score, bound). Bounded LRU, safe to share
+    # between sessions/threads.
+    def __init__(self, maxsize=200_000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, score, bound):
+        with self.lock:
+            self.entries[key] = (score, bound)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# --- Search ---
+def minimax(board, is_max, alpha=-2, beta=2, last=None, tt=None, nodes=None):
+    # Scores from O's (AI) point of view: 1 O wins, -1 X wins, 0 draw.
+    # `last` is the previous move, so only lines through it are checked.
+    # `nodes`, a one-item list, counts visited positions when given.
+    if nodes is not None:
+        nodes[0] += 1
+    if last is not None:
+        if board.wins_at(last, O if not is_max else X):
+            return -1 if is_max else 1
+    else:
+        winner = board.winner()
+        if winner == O:
+            return 1
+        if winner == X:
+            return -1
+        if winner == DRAW:
+            return 0
+    empty = board.empty()
+    if not empty:
+        return 0
+
+    if tt is not None:
+        key = (board.size, is_max) + board.canonical()
+        alpha_orig, beta_orig = alpha, beta
+        entry = tt.get(key)
+        if entry is not None:
+            score, bound = entry
+            if bound == EXACT:
+                return score
+            if bound == LOWER and score > alpha:
+                alpha = score
+            elif bound == UPPER and score < beta:
+                beta = score
+            if alpha >= beta:
+                return score
+
+    if is_max:
+        best = -2
+        for move in iter_bits(empty):
+            board.o |= 1 << move
+            val = minimax(board, False, alpha, beta, move, tt, nodes)
+            board.o ^= 1 << move
+            if val > best:
+                best = val
+            if best > alpha:
+                alpha = best
+            if beta <= alpha:
+                break
+    else:
+        best = 2
+        for move in iter_bits(empty):
+            board.x |= 1 << move
+            val = minimax(board, True, alpha, beta, move, tt, nodes)
+            board.x ^= 1 << move
+            if val < best:
+                best = val
+            if best < beta:
+                beta = best
+            if beta <= alpha:
+                break
+
+    if tt is not None:
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        tt.put(key, best, bound)
+    return best
+
+def best_move(board, player=O, tt=None, nodes=None):
+    # Full search for the side to move; returns (move, score).
+    is_max = player == O
+    best_val = None
+    move = None
+    for i in board.moves():
+        board.play(i, player)
+        val = minimax(board, not is_max, -2, 2, i, tt, nodes)
+        board.undo(i)
+        if best_val is None or (val > best_val if is_max else val < best_val):
+            best_val = val
+            move = i
+    return move, best_val
+
+
+# --- Iterative Deepening (larger boards) ---
+WIN = 1_000_000
+
+SearchResult = namedtuple("SearchResult", ["move", "score", "depth", "nodes", "elapsed"])
+
+class SearchTimeout(Exception):
+    pass
+
+def evaluate(me, opp, size):
+    # Open-line evaluation from the side to move: lines holding only one
+    # side's stones are scored by how close they are to completion
+    weights = line_weights(size)
+    score = 0
+    for mask in win_masks(size):
+        mine = me & mask
+        theirs = opp & mask
+        if mine and not theirs:
+            score += weights[mine.bit_count()]
+        elif theirs and not mine:
+            score -= weights[theirs.bit_count()]
+    return score
+
+class Searcher:
+    # Negamax alpha-beta with a private depth-aware table, killer moves and
+    # the history heuristic. Raises SearchTimeout when the deadline passes
+    # or the optional `stop` event is set.
+    def __init__(self, size, deadline, stop=None):
+        self.size = size
+        self.full = full_mask(size)
+        self.deadline = deadline
+        self.stop = stop
+        self.nodes = 0
+        self.table = {}
+        self.killers = {}
+        self.history = [0] * (size * size)
+        self.center = center_order(size)
+
+    def ordered(self, empty, ply, first=None):
+        history = self.history
+        killers = self.killers.get(ply, ())
+        moves = [m for m in self.center if empty >> m & 1]
+        moves.sort(key=lambda m: (m != first, m not in killers, -history[m]))
+        return moves
+
+    def negamax(self, me, opp, depth, alpha, beta, ply, last):
+        if last is not None and any(opp & mask == mask for mask in cell_masks(self.size)[last]):
+            return -(WIN - ply)
+        self.nodes += 1
+        if not self.nodes & 255 and (time.perf_counter() > self.deadline or (self.stop and self.stop.is_set())):
+            raise SearchTimeout
+        empty = self.full & ~(me | opp)
+        if not empty:
+            return 0
+        if depth == 0:
+            return evaluate(me, opp, self.size)
+
+        key = (me, opp)
+        alpha_orig = alpha
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, score, bound, tt_move = entry
+            if e_depth >= depth:
+                if bound == EXACT:
+                    return score
+                if bound == LOWER and score > alpha:
+                    alpha = score
+                elif bound == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+
+        best = -WIN - 1
+        best_move = None
+        for move in self.ordered(empty, ply, tt_move):
+            val = -self.negamax(opp, me | 1 << move, depth - 1, -beta, -alpha, ply + 1, move)
+            if val > best:
+                best = val
+                best_move = move
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                killers = self.killers.setdefault(ply, [])
+                if move not in killers:
+                    killers.insert(0, move)
+                    del killers[2:]
+                self.history[move] += depth * depth
+                break
+
+        if best <= alpha_orig:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[key] = (depth, best, bound, best_move)
+        return best
+
+def iterative_deepening(board, player=O, time_budget=0.2, max_depth=None, stop=None):
+    # Deepen one ply at a time until the budget runs out; the move from the
+    # last completed depth is returned, so the answer is always legal.
+    start = time.perf_counter()
+    searcher = Searcher(board.size, start + time_budget, stop)
+    me, opp = (board.o, board.x) if player == O else (board.x, board.o)
+    empty = board.empty()
+    limit = empty.bit_count()
+    if max_depth is not None:
+        limit = min(limit, max_depth)
+
+    moves = searcher.ordered(empty, 0)
+    move, score, depth = moves[0] if moves else None, 0, 0
+    for d in range(1, limit + 1):
+        try:
+            alpha = -WIN - 1
+            best, best_val = None, -WIN - 1
+            for m in searcher.ordered(empty, 0, move):
+                val = -searcher.negamax(opp, me | 1 << m, d - 1, -WIN - 1, -alpha, 1, m)
+                if val > best_val:
+                    best, best_val = m, val
+                if best_val > alpha:
+                    alpha = best_val
+        except SearchTimeout:
+            break
+        move, score, depth = best, best_val, d
+        if abs(score) >= WIN - limit:
+            break  # Forced result found, deeper search cannot change it
+
+    return SearchResult(move, score, depth, searcher.nodes, time.perf_counter() - start)
+
+
+# --- Monte Carlo Tree Search ---
+MCTSResult = namedtuple("MCTSResult", ["move", "visits", "playouts", "elapsed", "playouts_per_sec"])
+
+class Node:
+    __slots__ = ("move", "player", "parent", "children", "untried", "result", "visits", "wins")
+
+    def __init__(self, move, player, parent, untried, result=None):
+        self.move = move
+        self.player = player  # Side that played `move`; wins are counted for it
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.result = result  # Set on terminal nodes
+        self.visits = 0
+        self.wins = 0.0
+
+    def select(self, c=1.4):
+        scale = c * sqrt(log(self.visits))
+        return max(self.children, key=lambda n: n.wins / n.visits + scale / sqrt(n.visits))
+
+def playout(size, x, o, player, rng):
+    # Random game to the end from (x, o) with `player` to move
+    masks = cell_masks(size)
+    moves = list(iter_bits(full_mask(size) & ~(x | o)))
+    rng.shuffle(moves)
+    for move in moves:
+        if player == X:
+            x |= 1 << move
+            if any(x & mask == mask for mask in masks[move]):
+                return X
+            player = O
+        else:
+            o |= 1 << move
+            if any(o & mask == mask for mask in masks[move]):
+                return O
+            player = X
+    return DRAW
+
+def mcts(size, x, o, player, time_budget=0.2, playouts=None, seed=None, stop=None):
+    # Single-process UCT; returns ({move: visits}, playouts run). Top-level
+    # so it can be pickled into a process pool.
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget
+    full = full_mask(size)
+    masks = cell_masks(size)
+    other = {X: O, O: X}
+    root = Node(None, other[player], None, list(iter_bits(full & ~(x | o))))
+    count = 0
+
+    while playouts is None or count < playouts:
+        if not count & 15 and (time.perf_counter() > deadline or (stop and stop.is_set())):
+            break
+        node, nx, no = root, x, o
+
+        # Selection
+        while node.result is None and not node.untried and node.children:
+            node = node.select()
+            if node.player == X:
+                nx |= 1 << node.move
+            else:
+                no |= 1 << node.move
+
+        # Expansion
+        if node.result is None and node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            mover = other[node.player]
+            if mover == X:
+                nx |= 1 << move
+                won = any(nx & mask == mask for mask in masks[move])
+            else:
+                no |= 1 << move
+                won = any(no & mask == mask for mask in masks[move])
+            untried = [] if won else list(iter_bits(full & ~(nx | no)))
+            child = Node(move, mover, node, untried, mover if won else None if untried else DRAW)
+            node.children.append(child)
+            node = child
+
+        # Simulation
+        result = node.result
+        if result is None:
+            result = playout(size, nx, no, other[node.player], rng)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if result == node.player:
+                node.wins += 1
+            elif result == DRAW:
+                node.wins += 0.5
+            node = node.parent
+        count += 1
+
+    return {child.move: child.visits for child in root.children}, count
+
+MCTS_SLICE = 0.05  # Seconds per round of process-pool jobs
+
+def parallel_mcts(board, player=O, time_budget=0.2, playouts=None, executor=None, workers=None, stop=None):
+    # Root parallelization: every worker grows its own tree from the same
+    # position and the root visit counts are merged. Without an executor the
+    # search runs in-process. An Event cannot reach the worker processes, so
+    # a timed search runs there in MCTS_SLICE rounds and `stop` is checked
+    # between rounds; each round starts fresh trees.
+    start = time.perf_counter()
+    workers = workers or getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+    per_worker = None if playouts is None else max(1, playouts // workers)
+    position = (board.size, board.x, board.o, player)
+
+    if executor is None or workers == 1:
+        results = [mcts(*position, time_budget, per_worker, seed=random.getrandbits(32), stop=stop)]
+    else:
+        deadline = start + time_budget
+        results = []
+        while not results or (per_worker is None and not (stop and stop.is_set())):
+            remaining = deadline - time.perf_counter()
+            if results and remaining <= 0:
+                break
+            budget = time_budget if per_worker is not None else min(max(remaining, 0.0), MCTS_SLICE)
+            futures = [
+                executor.submit(mcts, *position, budget, per_worker, seed=random.getrandbits(32))
+                for _ in range(workers)
+            ]
+            results += [f.result() for f in futures]
+            if per_worker is not None:
+                break
+
+    visits = {}
+    total = 0
+    for counts, count in results:
+        total += count
+        for move, n in counts.items():
+            visits[move] = visits.get(move, 0) + n
+
+    elapsed = time.perf_counter() - start
+    move = max(visits, key=visits.get) if visits else None
+    return MCTSResult(move, visits, total, elapsed, total / elapsed if elapsed else 0.0)
+
+
+# --- Move Selection ---
+# Per-move time budget (seconds) and depth cap for each AI difficulty
+DIFFICULTY_BUDGETS = {
+    "Easy": (0.02, 1),
+    "Normal": (0.08, 3),
+    "Hard": (0.2, None),
+}
+
+MoveResult = namedtuple("MoveResult", ["move", "nodes", "elapsed", "info"])
+
+def choose_move(board, player=O, difficulty="Normal", engine="Minimax", tt=None, table=None, executor=None, stop=None):
+    # What the page's AI plays: MCTS, the solved 3x3 table, exact 3x3 search,
+    # or iterative deepening. `nodes` counts search nodes (MCTS: playouts).
+    # Setting `stop` ends a timed search early with its best move so far.
+    start = time.perf_counter()
+    time_budget, max_depth = DIFFICULTY_BUDGETS[difficulty]
+
+    if engine == "MCTS":
+        with span("mcts"):
+            result = parallel_mcts(board, player, time_budget, executor=executor, stop=stop)
+        info = f"MCTS: {result.playouts:,} playouts ({result.playouts_per_sec:,.0f}/s)"
+        return MoveResult(result.move, result.playouts, result.elapsed, info)
+
+    if board.size == 3 and difficulty == "Hard":
+        entry = table.lookup(board, player) if table else None
+        if entry is not None:
+            return MoveResult(entry[1], 0, time.perf_counter() - start, "Minimax: solved table")
+        nodes = [0]
+        with span("minimax"):
+            move, _ = best_move(board.copy(), player, tt, nodes)
+        return MoveResult(move, nodes[0], time.perf_counter() - start, f"Minimax: full search, {nodes[0]:,} nodes")
+
+    with span("minimax"):
+        result = iterative_deepening(board, player, time_budget, max_depth, stop)
+    info = f"Minimax: depth {result.depth}, {result.nodes:,} nodes"
+    return MoveResult(result.move, result.nodes, result.elapsed, info)
+
+
+# --- Background Move Computation ---
+class MoveJob:
+    # One AI move running in a MovePool; `tag` lets the caller drop results
+    # that belong to a game that has since been reset
+    def __init__(self, future, stop, deadline, tag):
+        self.future = future
+        self.stop = stop
+        self.deadline = deadline
+        self.tag = tag
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def wait(self, timeout):
+        # True if the move finished within `timeout` seconds
+        wait([self.future], timeout)
+        return self.future.done()
+
+    def expired(self):
+        return time.perf_counter() > self.deadline
+
+    def cancel(self):
+        self.stop.set()
+        self.future.cancel()
+
+class MovePool:
+    # Bounded pool shared by all sessions: at most `max_pending` moves queued
+    # or running at once; submit() returns None when full.
+    def __init__(self, max_workers=2, max_pending=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="xo-ai")
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, fn, *args, deadline=1.0, tag=None, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            return None
+        stop = threading.Event()
+        try:
+            future = self.executor.submit(fn, *args, stop=stop, **kwargs)
+        except RuntimeError:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        return MoveJob(future, stop, time.perf_counter() + deadline, tag)
@@ -0,0 +1,136 @@
+import argparse
+import mmap
+import os
+from xo_engine import Board, DRAW, O, TranspositionTable, X, best_move, minimax
+
+# Solved-game table for 3x3 Tic-Tac-Toe.
+# Every position has a base-3 code (empty 0, X 1, O 2 per cell, cell 0 lowest).
+# The file holds two blocks of 3^9 bytes, first for X to move then for O to
+# move; each byte packs (value + 1) << 4 | best_move, with move 0xF on finished
+# games and 0xFF for positions that cannot be reached.
+#
+#   python xo_table.py            # regenerate data/xo3_table.bin
+#   python xo_table.py --check    # verify the shipped file against live minimax
+
+SIZE = 3
+CELLS = SIZE * SIZE
+CODES = 3 ** CELLS
+NO_MOVE = 0xF
+UNREACHABLE = 0xFF
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "xo3_table.bin")
+
+
+def encode(board):
+    code = 0
+    for i in range(CELLS - 1, -1, -1):
+        code *= 3
+        if board.x >> i & 1:
+            code += 1
+        elif board.o >> i & 1:
+            code += 2
+    return code
+
+def offset(board, player):
+    return (0 if player == X else CODES) + encode(board)
+
+def pack(value, move):
+    return (value + 1) << 4 | (NO_MOVE if move is None else move)
+
+
+def reachable():
+    # All (board, side to move) pairs reachable from an empty board, with
+    # either side starting
+    seen = set()
+    stack = [(Board(SIZE), X), (Board(SIZE), O)]
+    while stack:
+        board, player = stack.pop()
+        key = (board.x, board.o, player)
+        if key in seen:
+            continue
+        seen.add(key)
+        if board.winner() is None:
+            nxt = O if player == X else X
+            for move in board.moves():
+                child = board.copy()
+                child.play(move, player)
+                stack.append((child, nxt))
+    return seen
+
+def solve(board, player, tt):
+    winner = board.winner()
+    if winner is not None:
+        return {O: 1, X: -1, DRAW: 0}[winner], None
+    move, value = best_move(board, player, tt)
+    return value, move
+
+def generate():
+    table = bytearray([UNREACHABLE]) * (2 * CODES)
+    tt = TranspositionTable(maxsize=1_000_000)
+    for x, o, player in reachable():
+        board = Board(SIZE, x, o)
+        value, move = solve(board, player, tt)
+        table[offset(board, player)] = pack(value, move)
+    return bytes(table)
+
+
+class SolvedTable:
+    # Read-only view over the table file, memory-mapped once per process
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(data) != 2 * CODES:
+            raise ValueError(f"{path}: expected {2 * CODES} bytes, got {len(data)}")
+        return cls(data)
+
+    def lookup(self, board, player):
+        # (value, move) for the side to move, or None if not in the table
+        if board.size != SIZE:
+            return None
+        entry = self.data[offset(board, player)]
+        if entry == UNREACHABLE:
+            return None
+        move = entry & 0xF
+        return (entry >> 4) - 1, None if move == NO_MOVE else move
+
+
+def check(table):
+    # Compare every reachable entry with a fresh minimax run
+    tt = TranspositionTable(maxsize=1_000_000)
+    mismatches = 0
+    positions = reachable()
+    for x, o, player in positions:
+        board = Board(SIZE, x, o)
+        expected = solve(board, player, tt)
+        got = table.lookup(board, player)
+        if got is None or got[0] != expected[0]:
+            mismatches += 1
+            continue
+        # Any move that keeps the value is correct, not only the one stored
+        if got[1] is not None:
+            board.play(got[1], player)
+            value = minimax(board, player == X, -2, 2, got[1], tt)
+            if value != expected[0]:
+                mismatches += 1
+    return len(positions), mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or verify the solved 3x3 XO table")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--check", action="store_true", help="verify the file instead of writing it")
+    args = parser.parse_args()
+
+    if args.check:
+        total, mismatches = check(SolvedTable.load(args.path))
+        print(f"{total} positions checked, {mismatches} mismatches")
+        raise SystemExit(1 if mismatches else 0)
+
+    data = generate()
+    os.makedirs(os.path.dirname(args.path), exist_ok=True)
+    with open(args.path, "wb") as f:
+        f.write(data)
+    print(f"Wrote {args.path} ({len(data)} bytes, {sum(b != UNREACHABLE for b in data)} positions)")